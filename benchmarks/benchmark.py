@@ -0,0 +1,209 @@
+"""Benchmark decoding, export, and encoding of synthetic zs2 files.
+
+Test files are generated with the encoder (cf. zs2decode.builder) at a
+given scale, so results are reproducible without access to real data:
+
+    small_chunks   many sections with scalar values of all data types
+    arrays         large single- and double-precision arrays (EE04, EE05)
+    parameters     many parameter sections with QS_* records
+    audit_log      many Entry records of the event audit log
+
+For every file, the best time of "repeat" runs of each stage is recorded:
+load (decompression), data_stream_to_chunks, each level of parse_chunks,
+XML and text output, and re-encoding of the chunks to a data stream.
+Stages are timed directly, without instrumentation; the counters of
+zs2decode.stats (bytes and chunks per stage, chunk types) are collected in
+a separate run. Results are written to a JSON file, and can be compared
+to an earlier result file to catch regressions:
+
+    python benchmark.py --scale 2 --output new.json --compare old.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import zs2decode
+import zs2decode.builder as builder
+import zs2decode.encoder as encoder
+import zs2decode.parser as parser
+import zs2decode.stats as stats
+import zs2decode.util as util
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+#####################################
+#
+#       Synthetic files
+#
+
+def small_chunks(scale):
+    """Return chunks of many sections with scalar values."""
+    return builder.section('Document', [builder.section('Body', [
+        builder.section('Elem%i' % idx, [
+            builder.value('ID', idx, '22'),
+            builder.value('Index', -idx),
+            builder.value('Flag', idx % 2 == 0),
+            builder.value('Factor', 0.25*idx),
+            builder.value('Percent', 0.5*idx, 'BB'),
+            builder.value('Name', u'Element %i' % idx),
+            builder.array('Empty', []),
+            ])
+        for idx in range(int(20000*scale))])])
+
+def arrays(scale):
+    """Return chunks of large numeric arrays."""
+    count = int(1000000*scale)
+    return builder.section('Document', [builder.section('Body', [
+        builder.array('Single', [0.001*idx for idx in range(count)], 'EE04'),
+        builder.array('Double', [idx/3. for idx in range(count)], 'EE05'),
+        builder.array('Counts', [idx for idx in range(count//4)], 'EE16'),
+        ])])
+
+def parameters(scale):
+    """Return chunks of many parameters with QS_* records."""
+    return builder.section('Document', [builder.section('ParameterListe', [
+        builder.section('Elem%i' % idx, [
+            builder.value('ID', 10000+idx, '22'),
+            builder.record('QS_ValPar', 'BdSH(d)(B)B', [1, 0.125*idx, u'mm', 7, [], [], 0]),
+            builder.record('QS_TextPar', 'B4S', [1, u'Parameter %i' % idx, u'', u'', u'']),
+            builder.record('QS_ArrPar', 'B(L)B', [2, [idx, idx+1, idx+2], 0]),
+            builder.record('QS_NumFmt', 'B4Bd', [2, 1, 2, 3, 4, 0.5]),
+            ])
+        for idx in range(int(5000*scale))])])
+
+def audit_log(scale):
+    """Return chunks of many Entry records."""
+    return builder.section('Document', [builder.section('AuditLog', [
+        builder.record('Entry', 'B3BSdLSLBSS', [2, 1, 2, 3, u'operator', 1.5*idx, 4711, u'',
+                                              4712, 0, u'Event number %i' % idx, u'TestControl'])
+        for idx in range(int(20000*scale))])])
+
+_FILES = [('small_chunks', small_chunks), ('arrays', arrays),
+          ('parameters', parameters), ('audit_log', audit_log)]
+
+#####################################
+#
+#       Benchmark
+#
+
+def run(scale=1., repeat=3, directory=None):
+    """Generate files and return dict of results."""
+    results = {}
+    path = tempfile.mkdtemp(dir=directory)
+    try:
+        for name, generate in _FILES:
+            filename = os.path.join(path, name+'.zs2')
+            builder.save(filename, generate(scale))
+            results[name] = benchmark_file(filename, repeat)
+            results[name]['file_size'] = os.path.getsize(filename)
+    finally:
+        shutil.rmtree(path)
+    return {'zs2decode': zs2decode.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'scale': scale,
+            'repeat': repeat,
+            'results': results}
+
+def benchmark_file(filename, repeat=3):
+    """Return dict of best times of all stages for file."""
+    best = {}
+    for _ in range(repeat):
+        gc.collect()
+        for stage, seconds in _run_stages(filename).items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    with stats.collect() as statistics:
+        data_stream = parser.load(filename)
+        parser.parse_chunks(parser.data_stream_to_chunks(data_stream))
+    counters = dict((stage, {'bytes': record['bytes'], 'chunks': record['chunks']})
+                    for stage, record in statistics['stages'].items())
+    return {'data_stream_size': len(data_stream),
+            'chunks': len(parser.data_stream_to_chunks(data_stream)),
+            'chunk_types': statistics['chunk_types'],
+            'counters': counters,
+            'seconds': best}
+
+def compare(old, new, tolerance=0.1):
+    """Return list of lines comparing the results of two runs. Stages more
+       than "tolerance" slower are marked."""
+    lines = []
+    for name in sorted(new['results']):
+        old_seconds = old['results'].get(name, {}).get('seconds', {})
+        for stage, seconds in sorted(new['results'][name]['seconds'].items()):
+            if not old_seconds.get(stage): continue
+            ratio = seconds/old_seconds[stage]
+            lines.append('%-13s %-22s %9.4f s %9.4f s %6.2f%s' % (
+                name, stage, old_seconds[stage], seconds, ratio, '  <--' if ratio > 1+tolerance else ''))
+    return lines
+
+def _run_stages(filename):
+    """Return dict of times of all stages of a single run."""
+    seconds = {}
+    started = _clock()
+    data_stream = parser.load(filename)
+    seconds['load'] = _clock()-started
+    started = _clock()
+    chunks = parser.data_stream_to_chunks(data_stream)
+    seconds['data_stream_to_chunks'] = _clock()-started
+    # levels of parser.parse_chunks()
+    started = _clock()
+    chunks = parser._parse_chunk_types(chunks)
+    seconds['parse_chunks/1'] = _clock()-started
+    started = _clock()
+    chunks = parser._parse_chunk_ee_subtypes(chunks)
+    seconds['parse_chunks/2'] = _clock()-started
+    started = _clock()
+    chunks = parser._parse_chunk_ee11_data_records(chunks)
+    seconds['parse_chunks/3'] = _clock()-started
+    started = _clock()
+    util.chunks_to_XML(chunks)
+    seconds['chunks_to_XML'] = _clock()-started
+    started = _clock()
+    util.chunks_to_text_dump(chunks)
+    seconds['chunks_to_text_dump'] = _clock()-started
+    started = _clock()
+    encoder.make_datastream(encoder.iter_raw_chunks(chunks))
+    seconds['encode'] = _clock()-started
+    return seconds
+
+#####################################
+#
+#       Command line
+#
+
+def main(argv=None):
+    command_line = argparse.ArgumentParser(description='Benchmark zs2decode with synthetic files.')
+    command_line.add_argument('--scale', type=float, default=1., help='size of the files (default 1)')
+    command_line.add_argument('--repeat', type=int, default=3, help='runs per file (default 3)')
+    command_line.add_argument('--output', help='JSON file to write results to')
+    command_line.add_argument('--compare', help='JSON file of earlier results to compare to')
+    command_line.add_argument('--directory', help='directory for temporary files')
+    args = command_line.parse_args(argv)
+
+    results = run(args.scale, args.repeat, args.directory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            old = json.load(f)
+        if old.get('scale') != results['scale']:
+            print('Warning: results were obtained at scale %s and %s.' % (old.get('scale'), results['scale']))
+        print('%-13s %-22s %11s %11s %6s' % ('file', 'stage', 'old', 'new', 'ratio'))
+        print('\n'.join(compare(old, results)))
+    else:
+        for name in sorted(results['results']):
+            for stage, seconds in sorted(results['results'][name]['seconds'].items()):
+                print('%-13s %-22s %9.4f s' % (name, stage, seconds))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Asynchronous counterparts of the file functions for use with asyncio.
+
+Decompression, parsing, and conversion run in an executor so that they do
+not block the event loop. Every function takes an argument "executor",
+which is passed to loop.run_in_executor(): None selects the default
+thread pool of the event loop, and a concurrent.futures.ProcessPoolExecutor
+lets files be parsed on several CPUs at once (except by iter_chunks(),
+which requires a thread pool).
+
+map_files() runs a coroutine function for many files with a bounded
+number of files in progress at any time. Cancelling a coroutine cancels
+waiting for the result, but work already handed to the executor runs to
+completion in the background.
+
+    async def main(filenames):
+        return await aio.map_files(aio.convert, filenames, limit=16)
+
+Requires Python 3.6 or later.
+"""
+
+import asyncio as _asyncio
+import functools as _functools
+import threading as _threading
+
+import zs2decode.parser as _parser
+import zs2decode.encoder as _encoder
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+#####################################
+#
+#       File functions
+#
+
+async def load(filename, debug=False, executor=None):
+    """Open file and return data stream, cf. parser.load()."""
+    return await _run(executor, _parser.load, filename, debug=debug)
+
+async def load_chunks(filename, level=None, debug=False, executor=None):
+    """Open file and return list of parsed chunks, cf. parser.parse_chunks()."""
+    return await _run(executor, _load_chunks, filename, level, debug)
+
+async def convert(filename_in, filename_out=-1, executor=None):
+    """Convert zs2 file to XML file, cf. encoder.zs2_to_xml(). Returns XML
+       data."""
+    return await _run(executor, _encoder.zs2_to_xml, filename_in, filename_out)
+
+async def iter_chunks(filename, block_size=65536, max_bytes=None, batch_size=1000,
+                      debug=False, executor=None):
+    """Decompress file incrementally and yield raw chunks as they become
+       available, cf. parser.iter_chunks(). Chunks are read in the executor
+       in batches of "batch_size" chunks. "executor" must be a thread pool."""
+    chunks = _parser.iter_chunks(filename, block_size, max_bytes, debug)
+    lock = _threading.Lock()
+    try:
+        while True:
+            batch = await _run(executor, _next_batch, chunks, lock, batch_size)
+            for chunk in batch:
+                yield chunk
+            if len(batch) < batch_size: break
+    finally:
+        # close the file once the executor is done with the current batch
+        try:
+            await _run(executor, _close, chunks, lock)
+        except RuntimeError:
+            # the executor is shut down, i.e., no batch is being read
+            _close(chunks, lock)
+
+async def map_files(function, filenames, limit=8, return_exceptions=False, **kwargs):
+    """Return list of the results of coroutine function(filename, **kwargs)
+       for all files, processing at most "limit" files at a time. If a call
+       raises an exception, the remaining calls are cancelled unless
+       "return_exceptions" is set, in which case exceptions are returned
+       in place of results, cf. asyncio.gather()."""
+    semaphore = _asyncio.Semaphore(limit)
+    async def call(filename):
+        async with semaphore:
+            return await function(filename, **kwargs)
+    tasks = [_asyncio.ensure_future(call(filename)) for filename in filenames]
+    try:
+        return await _asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+#####################################
+#
+#       Helper functions
+#
+
+def _run(executor, function, *args, **kwargs):
+    loop = _get_running_loop()
+    return loop.run_in_executor(executor, _functools.partial(function, *args, **kwargs))
+
+# get_event_loop() is deprecated in coroutines since Python 3.10
+_get_running_loop = getattr(_asyncio, 'get_running_loop', _asyncio.get_event_loop)
+
+def _load_chunks(filename, level, debug):
+    data_stream = _parser.load(filename, debug=debug)
+    return _parser.parse_chunks(_parser.data_stream_to_chunks(data_stream, debug=debug), level, debug)
+
+def _next_batch(chunks, lock, batch_size):
+    with lock:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == batch_size: break
+        return batch
+
+def _close(chunks, lock):
+    with lock:
+        chunks.close()
@@ -0,0 +1,100 @@
+"""Build chunk lists for zs2 files programmatically.
+
+The functions return lists of chunks in the format of parser.parse_chunks(),
+which can be nested and passed to the encoder without going through XML:
+
+    chunks = section('Document', [
+                section('Body', [
+                    value('Version', 3),
+                    array('DataArray', [0., 0.5, 1.]),
+                    record('QS_TextPar', 'B4S', [1, u'Sample A', u'', u'', u'']),
+                    ]),
+                ])
+    save('test.zs2', chunks)
+
+Arrays may be lists, array.array, or numpy arrays.
+"""
+
+import numbers as _numbers
+
+import zs2decode.encoder as _encoder
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+# EE sub-types of array.array type codes and numpy data types
+_ARRAY_TYPES = {'f':'EE04', 'd':'EE05',
+                'float32':'EE04', 'float64':'EE05', 'uint32':'EE16'}
+
+#####################################
+#
+#       Chunks
+#
+
+def section(name, children=(), descriptor=''):
+    """Return chunks of a section containing the chunks in "children",
+       which may be a list of chunk lists as returned by the functions
+       of this module, or a flat list of chunks."""
+    chunks = [[None, _check_name(name), 'DD', descriptor]]
+    for child in children:
+        if len(child) and not isinstance(child[0], list): chunks.append(child)
+        else: chunks.extend(child)
+    chunks.append([None, '', 'end', []])
+    return chunks
+
+def value(name, data, type_code=None):
+    """Return chunk of a single value. The type code is inferred from
+       the type of "data" unless given: bool is stored as '99', int as
+       '11' (signed 32 bit), float as 'CC' (double), and text as 'AA'."""
+    if type_code is None:
+        if isinstance(data, bool): type_code = '99'
+        elif isinstance(data, _numbers.Integral): type_code = '11'
+        elif isinstance(data, _numbers.Real): type_code = 'CC'
+        elif isinstance(data, (type(u''), str)): type_code = 'AA'
+        else: raise ValueError('Cannot infer type code of %r' % (data,))
+    return [[None, _check_name(name), type_code, data]]
+
+def array(name, data, type_code=None):
+    """Return chunk of numeric array. The type code ('EE04' for single,
+       'EE05' for double precision, 'EE16' for unsigned 32-bit integers) is
+       inferred from array.array and numpy arrays, and is 'EE05' for lists."""
+    if type_code is None:
+        kind = getattr(data, 'typecode', None) or str(getattr(data, 'dtype', 'float64'))
+        if kind in ('I', 'L') and data.itemsize == 4: kind = 'uint32'
+        if kind not in _ARRAY_TYPES:
+            raise ValueError('Cannot infer type code of %s array' % kind)
+        type_code = _ARRAY_TYPES[kind]
+    return [[None, _check_name(name), type_code, data]]
+
+def record(name, fmt, data):
+    """Return chunk of type 'EE11' with values "data" encoded according to
+       format string "fmt", cf. the documentation of the file format."""
+    return [[None, _check_name(name), 'EE11-'+fmt if fmt else 'EE11', list(data)]]
+
+#####################################
+#
+#       Output
+#
+
+def to_data_stream(chunks):
+    """Return data stream of chunks."""
+    return _encoder.make_datastream(_encoder.iter_raw_chunks(chunks))
+
+def save(filename, chunks):
+    """Write chunks to zs2 file and return fingerprint of the data stream."""
+    return _encoder.write_zs2(filename, chunks)
+
+#####################################
+#
+#       Helper functions
+#
+
+def _check_name(name):
+    try:
+        length = len(bytearray(name, encoding='ASCII'))
+    except (UnicodeError, TypeError):
+        raise ValueError('Chunk name %r is not an ASCII string' % (name,))
+    if not 0 < length < 256:
+        raise ValueError('Chunk name %r must be 1 to 255 characters long' % (name,))
+    return name
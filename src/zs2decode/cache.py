@@ -0,0 +1,181 @@
+"""On-disk cache of parsed chunk lists.
+
+Parsed chunks are stored in a cache directory in pickle format, keyed by
+the fingerprint of the data stream (cf. encoder.fingerprint()), the
+parse level, the version of zs2decode, and _CACHE_FORMAT, which changes
+whenever the output of the parser changes between releases. Files are written to a
+temporary file first and renamed, so several processes may share a cache
+directory. The least recently used entries are removed once the size of
+the cache directory exceeds "max_size" bytes.
+
+The decompressed data stream of a file can be kept in the cache directory
+(or in a sidecar file next to the zs2 file) as well. It is memory-mapped
+on subsequent access, which skips decompression and lets processes share
+the data through the page cache of the operating system.
+"""
+
+import gzip as _gzip
+import hashlib as _hashlib
+import mmap as _mmap
+import os as _os
+import pickle as _pickle
+import shutil as _shutil
+import struct as _struct
+import tempfile as _tempfile
+
+import zs2decode as _zs2decode
+import zs2decode.parser as _parser
+import zs2decode.encoder as _encoder
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+_MAX_SIZE = 2**30
+_SUFFIX = '.pickle'
+_RAW_SUFFIX = '.raw'
+_CACHE_FORMAT = 1 # increment when parse_chunks() returns different chunks
+
+# os.rename does not overwrite existing files on Windows
+_replace = getattr(_os, 'replace', _os.rename)
+
+#####################################
+#
+#       Cached parsing
+#
+
+def load_chunks(filename, cache_dir, level=None, max_size=_MAX_SIZE, debug=False):
+    """Open file and return parsed chunks, using the cache in "cache_dir"."""
+    data_stream = _parser.load(filename, debug=debug)
+    return get_chunks(data_stream, cache_dir, level, max_size, debug)
+
+def get_chunks(data_stream, cache_dir, level=None, max_size=_MAX_SIZE, debug=False):
+    """Return parsed chunks of data stream (cf. parser.data_stream_to_chunks()
+       and parser.parse_chunks()) from cache, or parse and add to cache."""
+    level = level or 3
+    key = _cache_key(_encoder.fingerprint(data_stream), level, debug)
+    chunks = _read_entry(cache_dir, key)
+    if chunks is None:
+        raw_chunks = _parser.data_stream_to_chunks(data_stream, debug=debug)
+        chunks = _parser.parse_chunks(raw_chunks, level, debug)
+        _write_entry(cache_dir, key, _pickle.dumps(chunks, _pickle.HIGHEST_PROTOCOL))
+        evict(cache_dir, max_size)
+    return chunks
+
+def load_mapped(filename, cache_dir=None, max_size=_MAX_SIZE, debug=False):
+    """Return data stream of file as read-only memory map (cf. parser.load()).
+       The decompressed data stream is stored in "cache_dir", or in a sidecar
+       file with extension ".raw" next to the file if cache_dir is None.
+       Close the memory map once all chunks have been read."""
+    stat = _os.stat(filename)
+    if cache_dir is None:
+        directory, key = _os.path.dirname(filename) or '.', _os.path.basename(filename)
+    else:
+        identity = u'%s|%i|%r' % (_os.path.realpath(filename), stat.st_size, stat.st_mtime)
+        directory, key = cache_dir, _hashlib.sha224(identity.encode('UTF-8')).hexdigest()
+    path = _os.path.join(directory, key+_RAW_SUFFIX)
+    data_stream = _map_entry(path, filename, stat)
+    if data_stream is None:
+        with _gzip.open(filename, 'rb') as f:
+            _write_entry(directory, key, f, _RAW_SUFFIX)
+        if cache_dir is not None: evict(cache_dir, max_size)
+        data_stream = _map_entry(path, filename, stat)
+        if data_stream is None:
+            raise ValueError('Data stream of %s is empty or cannot be mapped.' % filename)
+    _parser._check_data_stream_header(data_stream, debug)
+    return data_stream
+
+#####################################
+#
+#       Cache maintenance
+#
+
+def evict(cache_dir, max_size=_MAX_SIZE):
+    """Remove least recently used entries until the cache is no larger than max_size bytes."""
+    entries = []
+    for name in _os.listdir(cache_dir):
+        if not name.endswith((_SUFFIX, _RAW_SUFFIX)): continue
+        try:
+            stat = _os.stat(_os.path.join(cache_dir, name))
+        except OSError:
+            continue # removed by another process
+        entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(entry[1] for entry in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_size: break
+        _remove(_os.path.join(cache_dir, name))
+        total -= size
+
+def clear(cache_dir):
+    """Remove all entries from cache."""
+    evict(cache_dir, 0)
+
+#####################################
+#
+#       Helper functions
+#
+
+def _cache_key(fingerprint, level, debug=False):
+    return '%s-%s.%i-%i%s' % (fingerprint, _zs2decode.__version__, _CACHE_FORMAT, level, '-debug' if debug else '')
+
+def _read_entry(cache_dir, key, suffix=_SUFFIX):
+    """Return unpickled cache entry or None."""
+    path = _os.path.join(cache_dir, key+suffix)
+    try:
+        with open(path, 'rb') as f:
+            value = _pickle.load(f)
+    except (IOError, OSError):
+        return None
+    except Exception:
+        # unreadable entry, e.g. written by an incompatible Python version
+        _remove(path)
+        return None
+    _touch(path)
+    return value
+
+def _map_entry(path, filename, stat):
+    """Return memory map of decompressed data stream if it is up to date."""
+    try:
+        with open(filename, 'rb') as f:
+            f.seek(-4, 2)
+            size_mod_32bit = _struct.unpack('<I', f.read(4))[0] # from gzip trailer
+        entry_stat = _os.stat(path)
+        if (entry_stat.st_size % 2**32 != size_mod_32bit or
+            entry_stat.st_mtime < stat.st_mtime or entry_stat.st_size == 0):
+            return None
+        with open(path, 'rb') as f:
+            data_stream = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):
+        return None
+    _touch(path)
+    return data_stream
+
+def _write_entry(cache_dir, key, data, suffix=_SUFFIX):
+    """Write cache entry atomically. Data may be bytes or a file object."""
+    if not _os.path.isdir(cache_dir):
+        try:
+            _os.makedirs(cache_dir)
+        except OSError:
+            if not _os.path.isdir(cache_dir): raise
+    fd, temporary = _tempfile.mkstemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        with _os.fdopen(fd, 'wb') as f:
+            if hasattr(data, 'read'): _shutil.copyfileobj(data, f, 2**20)
+            else: f.write(data)
+        _replace(temporary, _os.path.join(cache_dir, key+suffix))
+    except Exception:
+        _remove(temporary)
+        raise
+
+def _touch(path):
+    """Mark entry as recently used."""
+    try:
+        _os.utime(path, None)
+    except OSError:
+        pass
+
+def _remove(path):
+    try:
+        _os.remove(path)
+    except OSError:
+        pass # removed by another process or still in use
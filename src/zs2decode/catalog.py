@@ -0,0 +1,196 @@
+"""Catalog of zs2 files in an SQLite database.
+
+index_files() reads files (in parallel processes) and stores file
+metadata, sample names, QS_* parameters (cf. channels.get_parameters()),
+and the channels of every sample in an SQLite database, which can then be
+queried without opening any zs2 file, e.g. with find_files() or with SQL
+through a connection returned by connect().
+
+Files whose path, size, and modification time are unchanged since they
+were indexed are skipped without being read, and files that no longer
+exist are removed from the catalog. The content of a file is
+identified by the fingerprint of its data stream (cf. encoder.fingerprint()),
+and is stored only once for identical copies.
+
+Tables:
+
+    files(path, size, mtime, fingerprint)
+    samples(fingerprint, sample_idx, name)
+    parameters(fingerprint, sample_idx, id, type, value, numeric, unit)
+    channels(fingerprint, sample_idx, id, name, length, is_time)
+
+Parameter values are stored as text (JSON for records) in column value,
+and numeric values are additionally stored in column numeric.
+"""
+
+import json as _json
+import os as _os
+import sqlite3 as _sqlite3
+
+import zs2decode.parser as _parser
+import zs2decode.encoder as _encoder
+import zs2decode.channels as _channels
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, fingerprint TEXT);
+CREATE TABLE IF NOT EXISTS contents (fingerprint TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS samples (fingerprint TEXT, sample_idx INTEGER, name TEXT);
+CREATE TABLE IF NOT EXISTS parameters (fingerprint TEXT, sample_idx INTEGER, id INTEGER,
+                                       type TEXT, value TEXT, numeric REAL, unit TEXT);
+CREATE TABLE IF NOT EXISTS channels (fingerprint TEXT, sample_idx INTEGER, id INTEGER,
+                                     name TEXT, length INTEGER, is_time INTEGER);
+CREATE INDEX IF NOT EXISTS files_fingerprint ON files (fingerprint);
+CREATE INDEX IF NOT EXISTS samples_fingerprint ON samples (fingerprint);
+CREATE INDEX IF NOT EXISTS samples_name ON samples (name);
+CREATE INDEX IF NOT EXISTS parameters_fingerprint ON parameters (fingerprint);
+CREATE INDEX IF NOT EXISTS parameters_id_value ON parameters (id, value);
+CREATE INDEX IF NOT EXISTS parameters_id_numeric ON parameters (id, numeric);
+CREATE INDEX IF NOT EXISTS channels_fingerprint ON channels (fingerprint);
+CREATE INDEX IF NOT EXISTS channels_name ON channels (name);
+"""
+
+_CONTENT_TABLES = ('samples', 'parameters', 'channels')
+
+#####################################
+#
+#       Database functions
+#
+
+def connect(database):
+    """Return sqlite3 connection to catalog, creating tables if necessary."""
+    connection = _sqlite3.connect(database)
+    connection.executescript(_SCHEMA)
+    return connection
+
+def index_files(database, filenames, processes=None, debug=False):
+    """Add files to catalog, reading files that are new or have changed in
+       "processes" parallel processes (all CPUs if None, none if 1). Returns
+       dict mapping file names that could not be read to the exception."""
+    connection = connect(database)
+    errors = {}
+    try:
+        pending = [filename for filename in filenames if not _is_current(connection, filename)]
+        for filename, result in _map(_extract, pending, processes, debug):
+            if isinstance(result, Exception):
+                errors[filename] = result
+                continue
+            _store(connection, filename, result)
+            connection.commit()
+        _remove_missing(connection)
+        _remove_orphans(connection)
+        connection.commit()
+    finally:
+        connection.close()
+    return errors
+
+def find_files(database, parameter_id, value=None, like=None):
+    """Return sorted list of paths of files with a sample that has parameter
+       "parameter_id", optionally with the given value, or with a value that
+       matches SQL pattern "like" (e.g. 'X%' for values starting with X)."""
+    sql = ('SELECT DISTINCT files.path FROM files JOIN parameters'
+           ' ON files.fingerprint = parameters.fingerprint WHERE parameters.id = ?')
+    arguments = [parameter_id]
+    if value is not None:
+        sql += ' AND (parameters.value = ? OR parameters.numeric = ?)'
+        arguments += [_text(value), value if _is_number(value) else None]
+    if like is not None:
+        sql += ' AND parameters.value LIKE ?'
+        arguments.append(like)
+    connection = connect(database)
+    try:
+        return sorted(row[0] for row in connection.execute(sql, arguments))
+    finally:
+        connection.close()
+
+#####################################
+#
+#       Helper functions
+#
+
+def _file_identity(filename):
+    stat = _os.stat(filename)
+    return _os.path.abspath(filename), stat.st_size, stat.st_mtime
+
+def _is_current(connection, filename):
+    """Test if file is in catalog with unchanged size and modification time."""
+    path, size, mtime = _file_identity(filename)
+    row = connection.execute('SELECT size, mtime FROM files WHERE path = ?', (path,)).fetchone()
+    return row is not None and tuple(row) == (size, mtime)
+
+def _map(function, filenames, processes, debug):
+    """Yield (filename, result) of function(filename, debug)."""
+    if processes == 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield filename, function((filename, debug))
+        return
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        for filename, result in zip(filenames, pool.imap(function, [(filename, debug) for filename in filenames])):
+            yield filename, result
+    finally:
+        pool.close()
+        pool.join()
+
+def _extract(arguments):
+    """Return dict of catalog data of file, or the exception raised."""
+    filename, debug = arguments
+    try:
+        identity = _file_identity(filename)
+        data_stream = _parser.load(filename, debug=debug)
+        chunks = list(_channels._iter_numpy_chunks(data_stream, debug))
+        samples = _channels.get_samples(chunks)
+        parameters = _channels.get_parameters(chunks)
+    except Exception as e:
+        return e
+    # names need not be unique, samples are identified by their position
+    names = dict(zip(parameters['sample_idx'], parameters['sample_name']))
+    names.update((sample['sample_idx'], sample['sample_name']) for sample in samples)
+    return {'identity': identity,
+            'fingerprint': _encoder.fingerprint(data_stream),
+            'samples': sorted(names.items()),
+            'parameters': [(sample_idx, ID, type_code, _text(value), value if _is_number(value) else None, unit)
+                           for sample_idx, ID, type_code, value, unit in zip(
+                               parameters['sample_idx'], parameters['ID'], parameters['type'],
+                               parameters['value'], parameters['unit'])],
+            'channels': [(sample['sample_idx'], ID, name, len(data), int(ID == sample['time_channel_ID']))
+                         for sample in samples for ID, name, data in _channels.get_columns(sample)]}
+
+def _store(connection, filename, result):
+    fingerprint = result['fingerprint']
+    path, size, mtime = result['identity']
+    connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', (path, size, mtime, fingerprint))
+    if connection.execute('SELECT 1 FROM contents WHERE fingerprint = ?', (fingerprint,)).fetchone():
+        return # identical content is indexed already
+    connection.execute('INSERT INTO contents VALUES (?)', (fingerprint,))
+    connection.executemany('INSERT INTO samples VALUES (?, ?, ?)',
+                           [(fingerprint,)+row for row in result['samples']])
+    connection.executemany('INSERT INTO parameters VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           [(fingerprint,)+row for row in result['parameters']])
+    connection.executemany('INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?)',
+                           [(fingerprint,)+row for row in result['channels']])
+
+def _remove_missing(connection):
+    """Remove files that no longer exist."""
+    missing = [row[0] for row in connection.execute('SELECT path FROM files') if not _os.path.exists(row[0])]
+    connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in missing])
+
+def _remove_orphans(connection):
+    """Remove content that no file refers to any more."""
+    orphans = [row[0] for row in connection.execute(
+        'SELECT fingerprint FROM contents WHERE fingerprint NOT IN (SELECT fingerprint FROM files)')]
+    for fingerprint in orphans:
+        for table in ('contents',)+_CONTENT_TABLES:
+            connection.execute('DELETE FROM %s WHERE fingerprint = ?' % table, (fingerprint,))
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _text(value):
+    """Return value as stored in column "value"."""
+    if isinstance(value, (type(u''), str)): return value
+    return _json.dumps(value, ensure_ascii=False)
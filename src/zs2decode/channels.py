@@ -0,0 +1,304 @@
+"""Extract the time series data of samples and export them column by column.
+
+Data are located in the same way as in examples/raw_data_dump_from_xml.py,
+but directly from the chunks: channel names are taken from the
+ChannelManager of the series definition, and every section that contains
+an IndexTimeChannel is a data group with its DataChannels. Groups inside
+the elements of Body/batch/Series/SeriesElements are named after the
+sample name parameter (ID 48154) of that element, other groups are
+numbered.
+
+A sample is a dict with keys 'sample_name', 'time_channel_ID', and
+'channel_data', which maps channel IDs to dicts with keys 'name' and
+'data', as in the example script, and 'sample_idx', the position of the
+element in SeriesElements (or of the numbered group), which identifies
+samples that share a name. load_samples() decodes numeric arrays
+with numpy (if available) directly from the data stream, and the exporters
+pass these arrays on without converting them to Python lists.
+
+Exporters write one file per sample in NumPy (.npz), Arrow IPC (.arrow),
+Parquet (.parquet), or text (.txt, .tsv, .csv) format, with the time
+channel in the first column. Arrow and Parquet require pyarrow.
+"""
+
+import io as _io
+import itertools as _itertools
+import struct as _struct
+
+import zs2decode.parser as _parser
+import zs2decode.spill as _spill
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+_SAMPLE_NAME_ID = 48154
+_CHANNEL_MANAGER = 'Body/batch/SeriesDef/TestTaskDefs/Elem0/ChannelManager/ChannelManager'
+_SERIES_ELEMENTS = 'Body/batch/Series/SeriesElements'
+_PARAMETERS = 'EvalContext/ParamContext/ParameterListe'
+
+#####################################
+#
+#       Samples
+#
+
+def load_samples(filename, debug=False):
+    """Open file and return list of samples, cf. get_samples()."""
+    data_stream = _parser.load(filename, debug=debug)
+    return get_samples(_iter_numpy_chunks(data_stream, debug))
+
+def get_samples(chunks):
+    """Return list of samples found in parsed chunks."""
+    root = _section_tree(chunks)
+    channel_names = {}
+    for element in _elements(_find(root, _CHANNEL_MANAGER)):
+        name = _find(element, 'Name')
+        channel_names[element['values'].get('ID')] = name['values'].get('Text') if name else None
+
+    samples = []
+    for sample_idx, (sample_name, element) in enumerate(_sample_elements(root)):
+        groups = _data_groups(element)
+        if len(groups) == 0: continue
+        samples.append(_sample(groups[0], sample_idx, sample_name, channel_names))
+    if len(samples) == 0:
+        # this is more general but doesn't find sample names
+        for sample_idx, group in enumerate(_data_groups(root)):
+            samples.append(_sample(group, sample_idx, 'data_group-%i' % sample_idx, channel_names))
+    return samples
+
+def get_columns(sample):
+    """Return list of (ID, name, data) of the channels of a sample, with the
+       time channel first and all other channels sorted by ID. Names are
+       made unique by appending the ID if necessary."""
+    channel_data = sample['channel_data']
+    channels = sorted(channel_data)
+    if sample['time_channel_ID'] in channel_data:
+        channels.remove(sample['time_channel_ID'])
+        channels.insert(0, sample['time_channel_ID'])
+    names = [u'%s' % channel_data[ID]['name'] for ID in channels]
+    return [(ID, name if names.count(name) == 1 else u'%s (%s)' % (name, ID), channel_data[ID]['data'])
+            for ID, name in zip(channels, names)]
+
+def get_parameters(chunks):
+    """Return QS_* parameters of all samples found in parsed chunks as dict
+       of lists 'sample_name', 'sample_idx' (cf. get_samples()), 'ID', 'type'
+       (chunk name), 'value', and 'unit'.
+       Value and unit are taken from the record of QS_ValPar and QS_TextPar
+       parameters, otherwise value is the complete record and unit is None."""
+    keys = ('sample_name', 'sample_idx', 'ID', 'type', 'value', 'unit')
+    columns = dict((key, []) for key in keys)
+    for sample_idx, (sample_name, element) in enumerate(_sample_elements(_section_tree(chunks))):
+        for parameter in _elements(_find(element, _PARAMETERS)):
+            for name, record in parameter['values'].items():
+                if not name.startswith('QS_'): continue
+                value, unit = record, None
+                if name == 'QS_ValPar' and len(record) > 2: value, unit = record[1], record[2]
+                if name == 'QS_TextPar' and len(record) > 1: value = record[1]
+                for key, item in zip(keys, (sample_name, sample_idx, parameter['values'].get('ID'),
+                                            name, value, unit)):
+                    columns[key].append(item)
+    return columns
+
+#####################################
+#
+#       Data frames
+#
+
+def to_dataframe(sample):
+    """Return pandas.DataFrame of the channels of a sample (cf. get_columns()),
+       indexed by the time channel if there is one."""
+    import numpy
+    import pandas
+    columns = get_columns(sample)
+    index = None
+    if sample['time_channel_ID'] in sample['channel_data']:
+        _, name, data = columns.pop(0)
+        index = pandas.Index(numpy.asarray(data), name=name)
+    return pandas.DataFrame(dict((name, numpy.asarray(data)) for _, name, data in columns),
+                            index=index, columns=[name for _, name, _ in columns], copy=False)
+
+def parameters_to_dataframe(chunks):
+    """Return pandas.DataFrame with one row per parameter, cf. get_parameters()."""
+    import pandas
+    columns = get_parameters(chunks)
+    return pandas.DataFrame(columns, columns=['sample_name', 'sample_idx', 'ID', 'type', 'value', 'unit'])
+
+#####################################
+#
+#       Exporters
+#
+
+def export(filename, pattern='sample_data_%s.npz', debug=False):
+    """Write the data of every sample of file to a file named pattern % sample
+       name, in the format given by the extension of pattern. Returns list
+       of files written."""
+    extension = pattern.rsplit('.', 1)[-1].lower()
+    if extension not in _writers:
+        raise ValueError('Unsupported output format %r, use one of %s.' % (extension, ', '.join(sorted(_writers))))
+    write = _writers[extension]
+    filenames = []
+    for sample in load_samples(filename, debug):
+        if len(sample['channel_data']) == 0: continue
+        filenames.append(pattern % sample['sample_name'])
+        write(sample, filenames[-1])
+    return filenames
+
+def write_npz(sample, filename, compressed=False):
+    """Write channels of sample to NumPy .npz file, with one array per
+       channel name."""
+    import numpy
+    arrays = dict((name, numpy.asarray(data)) for _, name, data in get_columns(sample))
+    (numpy.savez_compressed if compressed else numpy.savez)(filename, **arrays)
+
+def write_arrow(sample, filename):
+    """Write channels of sample to Arrow IPC file. Channel IDs are stored
+       as field metadata."""
+    import pyarrow
+    table = _arrow_table(pyarrow, sample)
+    with pyarrow.OSFile(filename, 'wb') as sink:
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def write_parquet(sample, filename):
+    """Write channels of sample to Parquet file. Channel IDs are stored
+       as field metadata."""
+    import pyarrow
+    import pyarrow.parquet
+    pyarrow.parquet.write_table(_arrow_table(pyarrow, sample), filename)
+
+def write_text(sample, filename, delimiter='\t', block_size=65536):
+    """Write channels of sample to text file in the layout of the example
+       script: a row of quoted channel names, a row of channel IDs, and one
+       row per time step with values formatted as '%.9g'. The rows are
+       formatted and written in blocks of "block_size" rows."""
+    columns = get_columns(sample)
+    channel_data = sample['channel_data']
+    if len(columns) == 0:
+        raise ValueError('Sample %s has no data channels.' % sample['sample_name'])
+    if any(data is None for _, _, data in columns):
+        raise ValueError('Sample %s has channels without data.' % sample['sample_name'])
+    rows = len(columns[0][2])
+    if any(len(data) < rows for _, _, data in columns):
+        raise ValueError('Channels of sample %s differ in length.' % sample['sample_name'])
+    with _io.open(filename, 'wt', encoding='UTF-8') as f:
+        f.write(delimiter.join([u'"%s"' % channel_data[ID]['name'] for ID, _, _ in columns]))
+        f.write(u'\n')
+        f.write(delimiter.join([u'%s' % ID for ID, _, _ in columns]))
+        row_format = u'\n' + delimiter.join([u'%.9g'] * len(columns))
+        for start in range(0, rows, block_size):
+            block = [_as_list(data[start:start+block_size]) for _, _, data in columns]
+            # format the whole block at once
+            f.write((row_format * len(block[0])) % tuple(_itertools.chain.from_iterable(zip(*block))))
+
+_writers = {'npz': write_npz, 'arrow': write_arrow, 'feather': write_arrow,
+            'parquet': write_parquet,
+            'txt': write_text, 'tsv': write_text,
+            'csv': lambda sample, filename: write_text(sample, filename, ',')}
+
+#####################################
+#
+#       Helper functions
+#
+
+def _as_list(data):
+    return data.tolist() if hasattr(data, 'tolist') else data
+
+def _arrow_table(pyarrow, sample):
+    import numpy
+    columns = get_columns(sample)
+    arrays = [pyarrow.array(numpy.asarray(data)) for _, _, data in columns]
+    fields = [pyarrow.field(name, array.type, metadata={'id': u'%s' % ID})
+              for (ID, name, _), array in zip(columns, arrays)]
+    return pyarrow.Table.from_arrays(arrays, schema=pyarrow.schema(fields))
+
+def _iter_numpy_chunks(data_stream, debug=False):
+    """Yield parsed chunks with numeric arrays as numpy arrays if numpy is
+       available. The arrays are views of the data of the raw chunks
+       returned by data_stream_to_chunks(), so that the data are not
+       converted to lists of floats (cf. module spill)."""
+    try:
+        import numpy
+    except ImportError:
+        for chunk in _parser.parse_chunks(_parser.data_stream_to_chunks(data_stream, debug=debug), debug=debug):
+            yield chunk
+        return
+    batch = []
+    for raw_chunk in _parser.data_stream_to_chunks(data_stream, debug=debug):
+        address, name, data = raw_chunk
+        sub_type = _struct.unpack('<H', bytes(data[1:3]))[0] if name is not None and len(data) >= 7 and _parser._ord(data[0]) == 0xEE else None
+        if sub_type not in _spill._DTYPES:
+            batch.append(raw_chunk)
+            continue
+        for chunk in _parser.parse_chunks(batch, debug=debug):
+            yield chunk
+        batch = []
+        yield [address, name, u'EE%0.2X' % sub_type, numpy.frombuffer(data, _spill._DTYPES[sub_type], offset=7)]
+    for chunk in _parser.parse_chunks(batch, debug=debug):
+        yield chunk
+
+def _section_tree(chunks):
+    """Return root of tree of sections. A section is a dict with keys 'name',
+       'values' (dict of the first value of every chunk name), and 'children'."""
+    root = {'name': None, 'values': {}, 'children': []}
+    stack = [root]
+    for chunk in chunks:
+        address, name, data_type, data = chunk
+        if data_type == 'end':
+            if len(stack) > 1: stack.pop()
+        elif data_type == 'DD':
+            section = {'name': name, 'values': {}, 'children': []}
+            stack[-1]['children'].append(section)
+            stack.append(section)
+        else:
+            stack[-1]['values'].setdefault(name, data)
+    if len(root['children']) == 1:
+        return root['children'][0] # i.e., Document
+    return root
+
+def _find(section, path):
+    """Return first subsection with path relative to section, or None."""
+    for name in path.split('/'):
+        if section is None: return None
+        section = next((child for child in section['children'] if child['name'] == name), None)
+    return section
+
+def _elements(section):
+    """Return list of subsections named Elem*."""
+    if section is None: return []
+    return [child for child in section['children'] if child['name'].startswith('Elem')]
+
+def _sample_elements(root):
+    """Return list of (sample name, section) of the elements of SeriesElements."""
+    return [(_sample_name(element) or 'no-name-defined-%i' % sample_idx, element)
+            for sample_idx, element in enumerate(_elements(_find(root, _SERIES_ELEMENTS)))]
+
+def _data_groups(section):
+    """Return list of all sections containing an IndexTimeChannel."""
+    groups, stack = [], [section]
+    while len(stack):
+        current = stack.pop()
+        if 'IndexTimeChannel' in current['values']: groups.append(current)
+        stack.extend(reversed(current['children']))
+    return groups
+
+def _sample_name(element):
+    """Return sample name parameter of an element of SeriesElements, or None."""
+    for parameter in _elements(_find(element, _PARAMETERS)):
+        if parameter['values'].get('ID') != _SAMPLE_NAME_ID: continue
+        for value in parameter['values'].get('QS_TextPar', []):
+            if isinstance(value, type(u'')): return value or None
+    return None
+
+def _sample(group, sample_idx, sample_name, channel_names):
+    index_time_channel = group['values']['IndexTimeChannel']
+    time_channel_ID = None
+    channel_data = {}
+    for idx, channel in enumerate(_elements(_find(group, 'DataChannels'))):
+        ID = channel['values'].get('TrsChannelId')
+        channel_data[ID] = {'data': channel['values'].get('DataArray'),
+                            'name': channel_names.get(ID)}
+        if idx == index_time_channel: time_channel_ID = ID
+    return {'sample_name': sample_name,
+            'sample_idx': sample_idx,
+            'time_channel_ID': time_channel_ID,
+            'channel_data': channel_data}
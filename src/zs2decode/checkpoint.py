@@ -0,0 +1,408 @@
+"""Random access to the data stream of zs2 files through decompression checkpoints.
+
+zs2 files are gzip-compressed, i.e., data at the end of the data stream
+can normally only be reached by decompressing everything before it.
+Similar to zran.c of the zlib distribution, a full read of a file with
+load() records checkpoints at deflate block boundaries about every
+"spacing" bytes of the data stream and stores them in a sidecar file.
+A checkpoint consists of the position in the data stream, the bit position
+of the deflate block in the compressed file, and the preceding 32 kB of
+the data stream needed as dictionary. read() and read_chunks() then
+start decompression at the checkpoint closest to the requested address.
+
+The Python zlib module does not report block boundaries, and it cannot
+start decompression at a bit offset. Block boundaries are therefore found
+by calling inflate() of the zlib library through ctypes with Z_BLOCK, which
+stops at the end of every block, like zran.c does. A checkpoint is recorded
+at the first block boundary after every "spacing" bytes, i.e., checkpoints
+are further apart if deflate blocks are larger than "spacing" (up to a few
+MB for data that compress well). Decompression from a checkpoint is
+started by prepending empty deflate blocks whose length in bits matches
+the bit position of the checkpoint, which maintains the byte alignment
+that stored blocks rely on.
+
+If the zlib library cannot be loaded, block boundaries are located by
+advancing the decompressor of the zlib module one output byte at a time
+after every "spacing" bytes (a block header consumes considerably more
+input than any single symbol). Stored blocks, which zlib emits for data
+that do not compress, are recognized by consuming exactly one input byte
+per output byte and are skipped in larger steps. The search is abandoned
+after _SEARCH_BYTES bytes of output, i.e., a checkpoint is omitted rather
+than slowing down decompression, and each checkpoint found is confirmed
+before it is written to the sidecar file. Only few checkpoints are found
+this way in data that compress well. Use read_index() to check the
+checkpoints of a file.
+
+Requires Python 3.3 or later.
+"""
+
+import os as _os
+import struct as _struct
+import zlib as _zlib
+
+import zs2decode.parser as _parser
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+_SPACING = 4*2**20       # default distance between checkpoints in data stream
+_WINDOW = 32768          # deflate window size
+_BLOCK = 65536           # size of blocks read from compressed file
+_MIN_HEADER_BYTES = 10   # more input consumed by one output byte implies new block
+_SEARCH_BYTES = 65536    # give up searching for a block boundary after this many bytes
+_STORED_RUN = 64         # steps consuming one byte each indicate a stored block
+_STORED_STEP = 4096      # output skipped at once within stored blocks
+_MIN_STORED_HEADER = 5   # input consumed by one output byte at the start of a stored block
+_VERIFY_BYTES = 1024     # output compared when confirming a block boundary
+_SIDECAR_MARKER = b'ZS2IDX\x01'
+_Z_OK, _Z_STREAM_END, _Z_BUF_ERROR, _Z_BLOCK = 0, 1, -5, 5 # constants of zlib.h
+
+#####################################
+#
+#       File functions
+#
+
+def load(filename, spacing=_SPACING, debug=False):
+    """Open file, write sidecar file with checkpoints about every "spacing"
+       bytes of the data stream, and return data stream (cf. parser.load()).
+       The checkpoints recorded are returned by read_index()."""
+    with open(filename, 'rb') as f:
+        compressed = f.read()
+    result = _inflate_and_record_blocks(compressed, spacing)
+    if result is not None:
+        data_stream, checkpoints = result
+        _parser._check_data_stream_header(data_stream, debug)
+    else:
+        # zlib library not accessible through ctypes
+        data_stream, boundaries = _inflate_and_locate_blocks(compressed, spacing)
+        _parser._check_data_stream_header(data_stream, debug)
+        checkpoints = []
+        for position, approximate_offset in boundaries:
+            checkpoint = _confirm_block_boundary(compressed, data_stream, position, approximate_offset)
+            if checkpoint is not None: checkpoints.append(checkpoint)
+    _write_sidecar(filename, compressed, checkpoints)
+    return data_stream
+
+def read_index(filename):
+    """Return list of checkpoints of file, or None if the sidecar file
+       is missing, corrupt, or does not belong to the current file."""
+    try:
+        with open(_sidecar_name(filename), 'rb') as f:
+            sidecar = f.read()
+    except (IOError, OSError):
+        return None
+    if not sidecar.startswith(_SIDECAR_MARKER): return None
+    try:
+        return _parse_sidecar(filename, sidecar)
+    except (_struct.error, _zlib.error):
+        # truncated or corrupt, i.e. stale
+        return None
+
+def read(filename, address, length, index=None):
+    """Return "length" bytes of the data stream starting at "address".
+       Decompression starts at the closest preceding checkpoint in the
+       sidecar file (or in "index" as returned by read_index())."""
+    out = bytearray()
+    for piece in _iter_data_stream(filename, address, index):
+        out += piece
+        if len(out) >= length: break
+    return out[:length]
+
+def read_chunks(filename, address, count=None, index=None):
+    """Return raw chunks (cf. parser.data_stream_to_chunks()) starting with
+       the chunk at "address". If "count" is None, return only that chunk
+       or, if it starts a section, all chunks up to and including the
+       End-of-Section chunk of that section."""
+    read = _make_reader(_iter_data_stream(filename, address, index))
+    chunks, level = [], 0
+    for chunk in _parser._iter_chunks(read, address):
+        chunks.append(chunk)
+        if _parser._is_section_start(chunk): level += 1
+        elif _parser._is_section_end(chunk): level -= 1
+        if count is None and level <= 0: break
+        if count is not None and len(chunks) >= count: break
+    return chunks
+
+#####################################
+#
+#       Locating checkpoints
+#
+
+def _inflate_and_record_blocks(compressed, spacing):
+    """Decompress gzip data with inflate() of the zlib library, which stops
+       at every deflate block boundary if called with Z_BLOCK, and return
+       data stream and list of checkpoints (position, offset, bit, window)
+       about every "spacing" bytes. Returns None if the zlib library cannot
+       be loaded."""
+    import ctypes
+    libz = _load_libz(ctypes)
+    if libz is None: return None
+    stream = _z_stream(ctypes)()
+    if libz.inflateInit2_(ctypes.byref(stream), -_zlib.MAX_WBITS, libz.zlibVersion(), ctypes.sizeof(stream)) != _Z_OK:
+        return None
+    start = _gzip_header_length(compressed)
+    compressed = bytes(compressed)
+    output = ctypes.create_string_buffer(4*_BLOCK)
+    out, checkpoints = bytearray(), []
+    next_checkpoint = spacing
+    address, fed = ctypes.cast(ctypes.c_char_p(compressed), ctypes.c_void_p).value, start
+    try:
+        while True:
+            if stream.avail_in == 0 and fed < len(compressed):
+                stream.next_in, stream.avail_in = address+fed, min(len(compressed)-fed, 2**30)
+                fed += stream.avail_in
+            stream.next_out, stream.avail_out = ctypes.addressof(output), len(output)
+            result = libz.inflate(ctypes.byref(stream), _Z_BLOCK)
+            out += ctypes.string_at(output, len(output)-stream.avail_out)
+            if result == _Z_STREAM_END: break
+            if result == _Z_BUF_ERROR and fed == len(compressed): break # truncated file
+            if result != _Z_OK:
+                raise _zlib.error('Error %i while decompressing data.' % result)
+            # data_type: unused bits of the last input byte, 64 if in the
+            #   final block, and 128 at a block boundary
+            if stream.data_type & 192 == 128 and len(out) >= next_checkpoint:
+                offset, unused = start+stream.total_in, stream.data_type & 7
+                checkpoints.append((len(out), offset-1 if unused else offset, (8-unused) % 8,
+                                    bytes(out[-_WINDOW:])))
+                next_checkpoint = len(out)+spacing
+    finally:
+        libz.inflateEnd(ctypes.byref(stream))
+    return out, checkpoints
+
+def _load_libz(ctypes):
+    """Return the zlib library loaded with ctypes, or None."""
+    import ctypes.util
+    for name in ('z', 'zlib1', 'zlib'):
+        path = ctypes.util.find_library(name)
+        if path is None: continue
+        try:
+            libz = ctypes.CDLL(path)
+        except OSError:
+            continue
+        libz.zlibVersion.restype = ctypes.c_char_p
+        return libz
+    return None
+
+def _z_stream(ctypes):
+    """Return ctypes structure of z_stream of zlib.h."""
+    class ZStream(ctypes.Structure):
+        _fields_ = [('next_in', ctypes.c_void_p), ('avail_in', ctypes.c_uint), ('total_in', ctypes.c_ulong),
+                    ('next_out', ctypes.c_void_p), ('avail_out', ctypes.c_uint), ('total_out', ctypes.c_ulong),
+                    ('msg', ctypes.c_char_p), ('state', ctypes.c_void_p),
+                    ('zalloc', ctypes.c_void_p), ('zfree', ctypes.c_void_p), ('opaque', ctypes.c_void_p),
+                    ('data_type', ctypes.c_int), ('adler', ctypes.c_ulong), ('reserved', ctypes.c_ulong)]
+    return ZStream
+
+def _inflate_and_locate_blocks(compressed, spacing):
+    """Decompress gzip data and return data stream and a list of tuples
+       (position in data stream, approximate offset in compressed data)
+       of deflate blocks found after every "spacing" bytes."""
+    d = _zlib.decompressobj(-_zlib.MAX_WBITS)
+    offset = _gzip_header_length(compressed)
+    out, tail, boundaries = bytearray(), b'', []
+    next_checkpoint = spacing
+    while not d.eof:
+        if len(out) < next_checkpoint:
+            # decompress efficiently up to the next checkpoint
+            if len(tail) == 0:
+                tail = compressed[offset:offset+_BLOCK]
+                offset += len(tail)
+                if len(tail) == 0: break
+            out += d.decompress(tail, next_checkpoint-len(out))
+            tail = d.unconsumed_tail
+            continue
+        # advance one byte at a time until the input consumed
+        #   indicates that a new block header has been read.
+        #   (zlib decodes the code following the byte it returns, so
+        #   the new block starts after the output of that call.)
+        #   Stored blocks are skipped in larger steps, and the search
+        #   is abandoned after _SEARCH_BYTES to continue at full speed.
+        searched, stored = 0, 0
+        while searched < _SEARCH_BYTES and not d.eof:
+            if len(tail) < _STORED_STEP+64:
+                more = compressed[offset:offset+_STORED_STEP+256]
+                tail += more
+                offset += len(more)
+            consumed_before = offset-len(tail)
+            if stored >= _STORED_RUN:
+                # every output byte of a stored block consumes one input
+                #   byte, unless the block ends within the step
+                saved = d.copy()
+                piece = d.decompress(tail, _STORED_STEP)
+                if (offset-len(d.unconsumed_tail))-consumed_before == len(piece) and not d.eof:
+                    out += piece
+                    tail = d.unconsumed_tail
+                    continue
+                d, stored = saved, -_STORED_STEP # step through this piece
+            out += d.decompress(tail, 1)
+            tail = d.unconsumed_tail
+            if stored >= 0: searched += 1
+            consumed = (offset-len(tail))-consumed_before
+            if consumed >= _MIN_HEADER_BYTES or (stored < 0 and consumed >= _MIN_STORED_HEADER):
+                boundaries.append((len(out), consumed_before))
+                break
+            stored = stored+1 if consumed == 1 or stored < 0 else 0
+        next_checkpoint = len(out)+spacing
+    return out, boundaries
+
+def _confirm_block_boundary(compressed, data_stream, position, approximate_offset):
+    """Return checkpoint tuple (position, offset, bit, window) for the deflate
+       block that starts near "approximate_offset" and produces output at
+       "position" of the data stream, or None if no block start is found."""
+    window = bytes(data_stream[max(0, position-_WINDOW):position])
+    expected = bytes(data_stream[position:position+_VERIFY_BYTES])
+    if len(expected) < 32: return None
+    for offset in range(approximate_offset-2, approximate_offset+6):
+        for bit in range(8):
+            raw = compressed[offset:offset+8*_VERIFY_BYTES]
+            # a final block would end decompression early, and a spurious
+            #   stored block with this flag reproduces the output as well
+            if len(raw) == 0 or (_parser._ord(raw[0]) >> bit) & 1: continue
+            d = _zlib.decompressobj(-_zlib.MAX_WBITS, zdict=window)
+            try:
+                trial = d.decompress(_prime(raw, bit), len(expected))
+            except _zlib.error:
+                continue
+            if trial == expected:
+                return position, offset, bit, window
+    return None
+
+#####################################
+#
+#       Decompression from checkpoints
+#
+
+def _iter_data_stream(filename, address, index=None):
+    """Yield pieces of the data stream starting at "address"."""
+    if index is None: index = read_index(filename) or []
+    with open(filename, 'rb') as f:
+        header = f.read(_BLOCK)
+        checkpoint = (0, _gzip_header_length(header), 0, b'')
+        for candidate in index:
+            if checkpoint[0] < candidate[0] <= address: checkpoint = candidate
+        position, offset, bit, window = checkpoint
+        d = _zlib.decompressobj(-_zlib.MAX_WBITS, zdict=window) if len(window) else _zlib.decompressobj(-_zlib.MAX_WBITS)
+        f.seek(offset)
+        skip = address-position
+        raw = _prime(f.read(_BLOCK), bit)
+        while len(raw):
+            piece = d.decompress(raw)
+            if skip >= len(piece):
+                skip -= len(piece)
+            else:
+                yield piece[skip:]
+                skip = 0
+            if d.eof: break
+            raw = f.read(_BLOCK)
+
+def _prime(data, bit):
+    """Return deflate data that continue at bit "bit" of the first byte of
+       "data", preceded by empty blocks that maintain byte alignment."""
+    if bit == 0: return bytes(data)
+    prefix, length = _EMPTY_BLOCKS[bit]
+    full_bytes = length // 8
+    first = (prefix >> (8*full_bytes)) | (_parser._ord(data[0]) & (0xFF << bit) & 0xFF)
+    return prefix.to_bytes(full_bytes+1, 'little')[:full_bytes] + bytes((first,)) + bytes(data[1:])
+
+def _pack_bits(fields):
+    """Pack (value, number of bits) tuples least significant bit first."""
+    value, length = 0, 0
+    for field, bits in fields:
+        value |= field << length
+        length += bits
+    return value, length
+
+def _empty_blocks():
+    """Return dict of (bits, length) of non-final deflate blocks without
+       output, for every possible value of length % 8."""
+    # fixed Huffman codes: header and end-of-block code
+    fixed = [(0,1), (1,2), (0,7)]
+    # dynamic Huffman codes with nothing but an end-of-block code:
+    #   the code length code defines 18 (1 bit), 0 and 1 (2 bits each),
+    #   used to encode 256 literals of length 0, end-of-block of length 1,
+    #   and one distance of length 0. The number of code length codes
+    #   transmitted (hclen+4) changes the length of the block by 3 bits.
+    order = [16, 17, 18, 0, 8, 7, 9, 6, 10, 5, 11, 4, 12, 3, 13, 2, 14, 1, 15]
+    code_lengths = {18:1, 0:2, 1:2}
+    blocks = {}
+    for hclen in (14, 15):
+        dynamic = [(0,1), (2,2), (0,5), (0,5), (hclen,4)]
+        dynamic += [(code_lengths.get(symbol, 0), 3) for symbol in order[:hclen+4]]
+        dynamic += [(0,1), (127,7), (0,1), (107,7), (3,2), (1,2), (0,1)]
+        for count in range(4):
+            value, length = _pack_bits(dynamic+fixed*count)
+            blocks.setdefault(length % 8, (value, length))
+    return blocks
+
+_EMPTY_BLOCKS = _empty_blocks()
+
+def _make_reader(pieces):
+    """Return function read(size) that returns data from iterator "pieces"."""
+    buffer, pieces = bytearray(), iter(pieces)
+    def read(size):
+        while len(buffer) < size:
+            try: buffer.extend(next(pieces))
+            except StopIteration: break
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        return data
+    return read
+
+#####################################
+#
+#       Helper functions
+#
+
+def _gzip_header_length(data):
+    """Return length of gzip member header at the beginning of data."""
+    if data[:3] != b'\x1f\x8b\x08':
+        raise ValueError('File is not gzip-compressed.')
+    flags = _parser._ord(data[3])
+    length = 10
+    if flags & 0x04: # FEXTRA
+        length += 2+_struct.unpack('<H', data[length:length+2])[0]
+    if flags & 0x08: # FNAME
+        length = data.index(b'\x00', length)+1
+    if flags & 0x10: # FCOMMENT
+        length = data.index(b'\x00', length)+1
+    if flags & 0x02: # FHCRC
+        length += 2
+    return length
+
+def _sidecar_name(filename):
+    return filename+'.idx'
+
+def _file_identity(filename):
+    """Return file size and gzip trailer (CRC32 and ISIZE) of file."""
+    with open(filename, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        f.seek(max(0, file_size-8))
+        return file_size, f.read(8)
+
+def _parse_sidecar(filename, sidecar):
+    idx = len(_SIDECAR_MARKER)
+    file_size, trailer, count = _struct.unpack('<Q8sL', sidecar[idx:idx+20])
+    idx += 20
+    if (file_size, trailer) != _file_identity(filename): return None
+    checkpoints = []
+    for _ in range(count):
+        position, offset, bit, length = _struct.unpack('<QQBL', sidecar[idx:idx+21])
+        idx += 21
+        window = _zlib.decompress(sidecar[idx:idx+length])
+        idx += length
+        checkpoints.append((position, offset, bit, window))
+    return checkpoints
+
+def _write_sidecar(filename, compressed, checkpoints):
+    out = bytearray(_SIDECAR_MARKER)
+    out += _struct.pack('<Q8sL', len(compressed), bytes(compressed[-8:]), len(checkpoints))
+    for position, offset, bit, window in checkpoints:
+        packed_window = _zlib.compress(window)
+        out += _struct.pack('<QQBL', position, offset, bit, len(packed_window))
+        out += packed_window
+    temporary = '%s.%i.tmp' % (_sidecar_name(filename), _os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(out)
+    _os.replace(temporary, _sidecar_name(filename))
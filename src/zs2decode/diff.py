@@ -0,0 +1,148 @@
+"""Compare the chunks of two zs2 files.
+
+The chunks of both data streams are aligned by path, i.e., by the names
+of the enclosing sections and of the chunk itself. Chunks with the same
+path in the same section are matched in the order in which they occur.
+Sections with identical content hashes (cf. parser.section_tree()) are
+skipped without further inspection, and chunks are parsed only if their
+raw data differ, so unchanged arrays are never decoded.
+
+Differences are reported as lists [change, path, old_chunk, new_chunk],
+where change is 'added', 'removed', or 'changed', and the chunks are
+parsed chunks (cf. parser.parse_chunks()) or None. Added or removed
+sections are reported as a single difference of the section chunk.
+
+changed_sections() compares section trees with content hashes that may
+have been stored earlier, without access to the data streams.
+"""
+
+import zs2decode.parser as _parser
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+#####################################
+#
+#       Diff functions
+#
+
+def diff_zs2(filename_old, filename_new, level=None, debug=False):
+    """Return list of differences between two files."""
+    return diff_data_streams(_parser.load(filename_old, debug=debug),
+                             _parser.load(filename_new, debug=debug), level, debug)
+
+def diff_data_streams(old, new, level=None, debug=False):
+    """Return list of differences between two data streams. Changed chunks
+       are parsed at "level" (cf. parser.parse_chunks())."""
+    out = []
+    streams = memoryview(old), memoryview(new)
+    _diff_sections(streams, _section_tree(old), _section_tree(new), u'', level, debug, out)
+    return out
+
+def changed_sections(old_tree, new_tree):
+    """Return list of [change, path] of sections that differ between two
+       section trees (cf. parser.section_tree()), where change is 'added',
+       'removed', or 'changed'. Subsections of changed sections are
+       compared, but not those of added or removed sections."""
+    out = []
+    _diff_trees(old_tree, new_tree, out)
+    return out
+
+#####################################
+#
+#       Helper functions
+#
+
+# indices of tree node elements
+_NAME, _START, _CONT, _DATA_END, _END, _CHILDREN, _SECTION = range(7)
+
+def _section_tree(data_stream):
+    """Return list of nodes of the top-level chunks of the data stream. A
+       node is a list [name, start, start of data, end of data, end, children,
+       section], where end includes the End-of-Section chunk, children is a
+       list of nodes, and section is the corresponding section of
+       parser.section_tree(). Children and section are None for chunks that
+       are not sections."""
+    root = []
+    stack, sections = [root], []
+    for start, name, cont, next_start, section in _parser._iter_hashed_extents(data_stream, 0, []):
+        if name is None:
+            if len(sections):
+                sections.pop()[_END] = next_start
+                stack.pop()
+        elif section is not None:
+            node = [name, start, cont, next_start, None, [], section]
+            stack[-1].append(node)
+            stack.append(node[_CHILDREN])
+            sections.append(node)
+        else:
+            stack[-1].append([name, start, cont, next_start, next_start, None, None])
+    for node in sections:
+        # sections that are not closed
+        node[_END] = len(data_stream)
+    return root
+
+def _keyed(nodes, name=lambda node: node[_NAME]):
+    """Return list of ((name, occurrence), node) tuples."""
+    counts, out = {}, []
+    for node in nodes:
+        occurrence = counts.get(name(node), 0)
+        counts[name(node)] = occurrence+1
+        out.append(((name(node), occurrence), node))
+    return out
+
+def _diff_trees(old_sections, new_sections, out):
+    """Append differences between lists of sibling sections to "out"."""
+    name = lambda section: section['name']
+    new_keyed = _keyed(new_sections, name)
+    new_by_key = dict(new_keyed)
+    matched = set()
+    for key, old_section in _keyed(old_sections, name):
+        new_section = new_by_key.get(key)
+        if new_section is None:
+            out.append(['removed', old_section['path']])
+            continue
+        matched.add(key)
+        if old_section['hash'] != new_section['hash']:
+            out.append(['changed', new_section['path']])
+            _diff_trees(old_section['children'], new_section['children'], out)
+    for key, new_section in new_keyed:
+        if key not in matched:
+            out.append(['added', new_section['path']])
+
+def _diff_sections(streams, old_nodes, new_nodes, prefix, level, debug, out):
+    """Append differences between lists of sibling nodes to "out"."""
+    new_keyed = _keyed(new_nodes)
+    new_by_key = dict(new_keyed)
+    matched = set()
+    for key, old_node in _keyed(old_nodes):
+        path = prefix+u'/'+key[0] if prefix else key[0]
+        new_node = new_by_key.get(key)
+        if new_node is None:
+            out.append(['removed', path, _parse(streams[0], old_node, level, debug), None])
+            continue
+        matched.add(key)
+        old_is_section, new_is_section = old_node[_CHILDREN] is not None, new_node[_CHILDREN] is not None
+        if old_is_section != new_is_section:
+            out.append(['removed', path, _parse(streams[0], old_node, level, debug), None])
+            out.append(['added', path, None, _parse(streams[1], new_node, level, debug)])
+            continue
+        if old_is_section and old_node[_SECTION]['hash'] == new_node[_SECTION]['hash']:
+            continue
+        if _data(streams[0], old_node) != _data(streams[1], new_node):
+            out.append(['changed', path, _parse(streams[0], old_node, level, debug),
+                        _parse(streams[1], new_node, level, debug)])
+        if old_is_section:
+            _diff_sections(streams, old_node[_CHILDREN], new_node[_CHILDREN], path, level, debug, out)
+    for key, new_node in new_keyed:
+        if key not in matched:
+            path = prefix+u'/'+key[0] if prefix else key[0]
+            out.append(['added', path, None, _parse(streams[1], new_node, level, debug)])
+
+def _data(stream, node):
+    return stream[node[_CONT]:node[_DATA_END]]
+
+def _parse(stream, node, level, debug):
+    raw_chunk = [node[_START], node[_NAME], bytearray(_data(stream, node))]
+    return _parser.parse_chunks([raw_chunk], level, debug)[0]
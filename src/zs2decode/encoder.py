@@ -18,12 +18,6 @@ import zs2decode.util as _util
 #    Python 2/3 compatibility
 #
 
-def _join(head, tail):
-    if _sys.version_info.major < 3:
-        return sum(tail, head)
-    else:
-        return head+b''.join(tail)
-    
 def save_zs2(filename, raw_data_stream):
     if _sys.version_info.major < 3:
         result = _write_TE2(filename, str(raw_data_stream))
@@ -31,6 +25,19 @@ def save_zs2(filename, raw_data_stream):
         result = _write_TE2(filename, raw_data_stream)
     return result
 
+# GzipFile.write() requires str in Python 2
+_gzip_data = str if _sys.version_info.major < 3 else (lambda data: data)
+
+def write_zs2(filename, chunks):
+    """Encode parsed chunks (list or iterator) and write them to zs2 file
+       or seekable file object as they are produced, without assembling the
+       data stream in memory. The file is identical to the output of
+       save_zs2(). Returns fingerprint of the data stream."""
+    if hasattr(filename, 'write'):
+        return _write_TE2_stream(filename, chunks)
+    with open(filename, 'wb') as fp:
+        return _write_TE2_stream(fp, chunks)
+
 ######################################
 #
 #     Helper function for zs2 output
@@ -52,6 +59,22 @@ def _write_TE2(filename, data):
             fp.write(buffer)
 
     return buffer    
+
+def _write_TE2_stream(fp, chunks):
+    """Write chunks to file object in the same way as _write_TE2()."""
+    start = fp.tell()
+    sha = _hashlib.sha224()
+    with _gzip.GzipFile(fileobj = fp, filename='', mode='wb', compresslevel=6, mtime=0) as f:
+        for piece in iter_datastream(iter_raw_chunks(chunks)):
+            piece = _gzip_data(piece)
+            sha.update(piece)
+            f.write(piece)
+        f.flush()
+    end = fp.tell()
+    fp.seek(start+8)
+    fp.write(b'\x00\x0b') # XFL and OS, cf. _write_TE2()
+    fp.seek(end)
+    return sha.hexdigest()
     
 #########################################
 #
@@ -68,10 +91,7 @@ def make_chunk_list(root):
         chunk_name = root.nodeName
     data_type = root.attributes['type'].value
     data_value_str = root.attributes['value'].value
-    if data_type.upper() in ('AA','00','DD'):
-        data_value = _json.loads('"%s"' % data_value_str)        
-    else:        
-        data_value = _json.loads(data_value_str)        
+    data_value = _parse_value(data_type, data_value_str)
                 
     # note that originally, the last element is supposed to be 
     chunks = [[None, chunk_name, data_type, data_value]]
@@ -88,26 +108,80 @@ def make_chunk_list(root):
         
     return chunks
 
+def _parse_value(data_type, text):
+    """Return value of XML attribute. Numbers are parsed directly,
+       which is considerably faster than json.loads()."""
+    data_type = data_type.upper()
+    if data_type in ('AA','00','DD'):
+        return _json.loads('"%s"' % text)
+    try:
+        if data_type in ('BB','CC'): return float(text) # accepts NaN and Infinity
+        if data_type in ('11','22','33','44','55','66','88'): return int(text)
+    except ValueError:
+        pass
+    return _json.loads(text)
+
 def make_raw_chunks(chunks, address = 4):
-    raw_chunks = []
+    return list(iter_raw_chunks(chunks, address))
+
+def iter_raw_chunks(chunks, address = 4):
+    """Encode parsed chunks one at a time, cf. make_raw_chunks()."""
     for _, name, type, value in chunks:
         if name == '' and type == 'end':
-            raw_chunks.append([address, None, value])
+            yield [address, None, value]
             address += 1
         else:
             data = _encode_data(type, value)
-            raw_chunks.append([address, name, data])
+            yield [address, name, data]
             address += len(name)+1 + len(data)
-    return raw_chunks
 
 def make_datastream(raw_chunks):
-    header = bytearray(b'\xaf\xbe\xad\xde')    
     # doing the following in a list comprehension is incredibly slow in Python 2
-    stream = header
-    for _, name, data in raw_chunks:
-        stream += _make_ASCII_string(name)+data if name is not None else bytearray(b'\xff')
+    stream = bytearray()
+    for piece in iter_datastream(raw_chunks):
+        stream += piece
     return stream
 
+def iter_datastream(raw_chunks):
+    """Yield consecutive pieces of the data stream, cf. make_datastream()."""
+    yield bytearray(b'\xaf\xbe\xad\xde')
+    for _, name, data in raw_chunks:
+        if name is None:
+            yield bytearray(b'\xff')
+        else:
+            yield _make_ASCII_string(name)
+            yield data
+
+def patch_data_stream(data_stream, changes, debug=False):
+    """Return copy of data stream with new values of some chunks. "changes"
+       maps paths (cf. parser.get_paths()) or addresses of chunks to values.
+       A path applies to all chunks with that path. Only these chunks are
+       encoded again, keeping their type code, and all other bytes of the
+       data stream are copied unchanged."""
+    changes = dict((key if isinstance(key, int) else _parser._normalize_path(key), value)
+                   for key, value in changes.items())
+    _parser._check_data_stream_header(data_stream, debug)
+    view = memoryview(data_stream)
+    raw_chunks = ([start, name, view[cont:next_start]] for start, name, cont, next_start
+                  in _parser._iter_chunk_extents(data_stream))
+    out, copied, applied = bytearray(), 0, set()
+    for path, chunk in _parser._iter_paths(raw_chunks):
+        address, name, data = chunk
+        if name is None: continue
+        key = address if address in changes else path
+        if key not in changes: continue
+        type_code = _parser.parse_chunks([[address, name, bytearray(data)]], debug=debug)[0][2]
+        cont = address+1+len(name) # one byte per character of name
+        out += view[copied:cont]
+        out += _encode_data(type_code, changes[key])
+        copied = cont+len(data)
+        applied.add(key)
+    missing = [key for key in changes if key not in applied]
+    if len(missing):
+        raise ValueError('No chunk found for %s' % ', '.join(repr(key) for key in missing))
+    out += view[copied:]
+    return out
+
 #########################################
 #
 #       Helper functions for encoding
@@ -144,7 +218,17 @@ def _encode_EE11_format_helper(fmt, values, debug=False):
             #print('sub_fmt',sub_fmt,'to run',len(values[values_idx]),'times')
 
             data += _pack1('L',len(values[values_idx]))
-            
+
+            if sub_fmt in _parser._fmt_map:
+                # list of numbers: pack at once unless special cases apply
+                try:
+                    data += _pack_array(sub_fmt, values[values_idx])
+                    values_idx += 1
+                    fmt_idx = close_idx + 1
+                    continue
+                except (_struct.error, TypeError, ValueError):
+                    pass
+
             for list_element_tuple in values[values_idx]:
                 if not isinstance(list_element_tuple,(list,tuple)):                    
                     list_element_tuple = [list_element_tuple]
@@ -203,14 +287,14 @@ def _encode_EE11(type, value):
 def _encode_EE(type, value):
     length = _pack1('L',len(value))
     if type == 'EE04':
-        payload = _join(length,[_pack1('f',v) for v in value])
+        payload = length+_pack_array('f',value)
     elif type == 'EE05':
-        payload = _join(length,[_pack1('d',v) for v in value])
+        payload = length+_pack_array('d',value)
     elif type == 'EE00':
         if len(value): raise ValueError('Expected list of length 0 in %r %r' % (type, value))
         payload = length
     elif type == 'EE16':
-        payload = _join(length,[_pack1('L',v) for v in value])
+        payload = length+_pack_array('L',value)
     elif type.startswith('EE11'):
         payload = _encode_EE11(type, value)
     else:
@@ -218,6 +302,27 @@ def _encode_EE(type, value):
     return bytearray.fromhex(type[2:4])+b'\x00'+payload
 
 _pack1 = lambda f,v: bytearray(_struct.pack('<'+_parser._fmt_map[f],v))
+
+# numpy data types corresponding to format characters
+_dtypes = {'B':'<u1', 'H':'<u2', 'L':'<u4', 'Q':'<u8',
+           'b':'<i1', 'h':'<i2', 'l':'<i4', 'q':'<i8',
+           'f':'<f4', 'd':'<f8'}
+
+def _pack_array(f, values):
+    """Pack sequence of numbers with format character f. This is equivalent
+       to joining the output of _pack1 for every value, but much faster."""
+    if hasattr(values, 'dtype') and hasattr(values, 'astype'):
+        # numpy array
+        if values.dtype.kind not in 'biu' and f not in 'fd':
+            raise TypeError('Cannot pack %s array with format %r' % (values.dtype, f))
+        if f not in 'fd' and len(values):
+            # astype() would wrap around silently
+            import numpy
+            limits = numpy.iinfo(_dtypes[f])
+            if int(values.min()) < limits.min or int(values.max()) > limits.max:
+                raise _struct.error('Values of %s array out of range of format %r' % (values.dtype, f))
+        return bytearray(values.astype(_dtypes[f]).tobytes())
+    return bytearray(_struct.pack('<%i%s' % (len(values), _parser._fmt_map[f]), *values))
     
 def _encode_data(type, value):
     chunk_type = bytearray.fromhex(type[:2])
@@ -274,6 +379,48 @@ def test_process_cycle(zs2_file_name, verbose=True):
         raise ValueError('Decode/Encode cycle of %s is unsuccessful.' % zs2_file_name)
     return input_fingerprint == output_fingerprint
 
+def find_divergence(data_stream, debug=False):
+    """Parse data stream and encode the parsed chunks again without the
+       XML stage. Returns the address of the first chunk that is not encoded
+       identically (or cannot be encoded), or None if all chunks match."""
+    raw_chunks = _parser.data_stream_to_chunks(data_stream, debug=debug)
+    chunks = _parser.parse_chunks(raw_chunks, debug=debug)
+    for (address, name, data), chunk in zip(raw_chunks, chunks):
+        if name is None:
+            if chunk[2] != 'end': return address
+            continue
+        try:
+            encoded = _encode_data(chunk[2], chunk[3])
+        except Exception:
+            return address
+        if chunk[1] != name or encoded != data:
+            return address
+    return None
+
+def verify_zs2(filename, debug=False):
+    """Return address of the first chunk of file that does not survive
+       a decode/encode cycle, or None if the cycle is successful."""
+    return find_divergence(_parser.load(filename, debug=debug), debug)
+
+def verify_zs2_files(filenames, processes=None):
+    """Verify files in parallel, cf. verify_zs2(). Returns dict mapping
+       file names to the address of the first diverging chunk, None if
+       the file passes, or the exception raised if it cannot be read."""
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = dict(pool.imap_unordered(_verify_zs2_worker, filenames))
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+def _verify_zs2_worker(filename):
+    try:
+        return filename, verify_zs2(filename)
+    except Exception as e:
+        return filename, e
+
 ######################################################################
 #
 #    General conversion operations
@@ -295,6 +442,22 @@ def data_stream_to_xml(data_stream):
     xml_data = _util.chunks_to_XML(chunks)
     return xml_data
     
+def patch_zs2(filename_in, changes, filename_out=-1, verbose=False):
+    """Replace values of chunks in file, cf. patch_data_stream().
+       Set filename_out to None to suppress output to disk"""
+    if filename_out == -1:
+        filename_out = filename_in.rsplit('.',1)[0]+'_patched.zs2'
+
+    if verbose:
+        print('Patching %s' % filename_in)
+
+    data_stream = patch_data_stream(_parser.load(filename_in), changes)
+
+    if verbose:
+        print('  Data fingerprint: %s' % fingerprint(data_stream))
+    file_data = save_zs2(filename_out, data_stream)
+    return file_data
+
 def xml_to_zs2(filename_in, filename_out=-1, verbose=False):
     """Set filename_out to None to suppress output to disk"""
     if filename_out == -1:
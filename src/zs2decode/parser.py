@@ -1,6 +1,7 @@
 """Module to import and decode zs2 files."""
 
 import gzip as _gzip
+import hashlib as _hashlib
 import struct as _struct
 
 # Author: Chris Petrich
@@ -16,7 +17,7 @@ import struct as _struct
 _ord= lambda x: x if isinstance(x,int) else ord(x)
 # turn byte/str/int/unicode into unicode character(s)
 _chr= lambda x: u'%c'%x if isinstance(x,int) else u'%c'%_ord(x)
-_to_string= lambda data: u''.join([_chr(elem) for elem in data])
+_to_string= lambda data: bytearray(data).decode('latin-1') # maps each byte to the same code point
 
 ######## convenience function
 _unpack1= lambda fmt, data: _struct.unpack('<'+_fmt_map[fmt],data)[0]
@@ -42,67 +43,278 @@ def load(filename, debug=False):
     # while in Py2 type(data[0])==str, and type(data[:1])==str
     with _gzip.open(filename, 'rb') as f:
         data_stream = bytearray( f.read() )
+    _check_data_stream_header(data_stream, debug)
+    return data_stream
+
+def _check_data_stream_header(data_stream, debug=False):
+    """Raise ValueError if the data stream does not start as expected."""
     if len(data_stream)<4:
         raise ValueError('Data stream is too short.')
     if not debug and not _has_file_marker(data_stream):
         raise ValueError('File marker is missing. Found 0x%X, expected 0xDEADBEAF.' % _unpack1('L',data_stream[:4]))
     if not debug and _has_extended_header(data_stream):
         raise ValueError('File has unexpected, extended binary header. Try processing file in debug mode.')
-    return data_stream
+
+def iter_chunks(filename, block_size=65536, max_bytes=None, debug=False):
+    """Decompress file incrementally and yield chunks as they become available.
+       Chunks are identical to the output of data_stream_to_chunks().
+       Decompression stops after "max_bytes" bytes of the data stream, and
+       chunks extending beyond that limit are not returned.
+       Set debug to True to accept data streams with an unexpected header.
+       Note that, unlike data_stream_to_chunks(), chunks are not searched for
+       heuristically in debug mode; use data_stream_to_chunks(load(filename,
+       True), debug=True) for files with unknown chunk types."""
+    with _gzip.open(filename, 'rb') as f:
+        for chunk in _iter_chunks(f.read, 0, block_size, max_bytes, debug):
+            yield chunk
+
+def _iter_chunks(read, start, block_size=65536, max_bytes=None, debug=False, spill=None):
+    """Yield raw chunks from data returned by function read(size), where
+       "start" is the address of the first byte returned. The first chunk
+       has to start at that address, or after the file marker if start is 0.
+       Function spill(name, data, remaining, read) is called for chunks that
+       do not fit into the buffer, with the chunk data available so far and
+       the number of bytes still to be read. If it returns anything but None,
+       it has read the remaining bytes and its return value replaces the
+       chunk data."""
+    buffer = bytearray()
+    base, index = start, 4 if start == 0 else 0 # base is the address of buffer[0]
+    eof, limited, checked = False, False, start != 0
+    required = block_size # number of bytes we would like to have after index
+    while True:
+        if not eof and len(buffer)-index < required:
+            size = max(block_size, required-(len(buffer)-index), 0 if checked else 1024)
+            if max_bytes is not None:
+                size = min(size, max_bytes-base-len(buffer))
+                limited = size <= 0
+            piece = read(size) if size > 0 else b''
+            eof = len(piece) == 0
+            buffer += piece
+            continue
+        if not checked:
+            _check_data_stream_header(buffer, debug)
+            checked = True
+        if index >= len(buffer): break
+        try:
+            name, cont, next_start = _get_chunk_extent(buffer, index)
+            complete = (name is None) or (cont < len(buffer) and next_start <= len(buffer))
+        except (IndexError, _struct.error):
+            # chunk header is incomplete
+            if eof and not limited: raise
+            complete, next_start = False, len(buffer)+block_size
+        if not complete:
+            if limited: break
+            if not eof and spill is not None and name is not None and cont <= len(buffer):
+                data = spill(name, buffer[cont:], next_start-len(buffer), read)
+                if data is not None:
+                    yield [base+index, name, data]
+                    base, index, required = base+next_start, 0, block_size
+                    del buffer[:]
+                    continue
+            if not eof:
+                required = max(block_size, next_start-index+1)
+                continue
+        required = block_size
+        if name is None:
+            yield [base+index, None, []]
+        else:
+            yield [base+index, name, buffer[cont:next_start]]
+        index = next_start
+        if index >= block_size:
+            # discard processed data
+            del buffer[:index]
+            base, index = base+index, 0
+
+def probe(filename, paths=None, max_bytes=None, max_chunks=None, level=None, debug=False):
+    """Read chunks from the beginning of a file only until all sections and
+       chunks listed in "paths" are complete, "max_bytes" bytes of the data
+       stream have been decompressed, or "max_chunks" chunks have been read,
+       whichever comes first. Paths are names separated by '/', starting with
+       the name of the root section (see get_paths()).
+       Returns the partial chunk list parsed at "level", or the raw chunks
+       of data_stream_to_chunks() if level is 0. Sections may be incomplete."""
+    remaining = set(_normalize_path(path) for path in paths) if paths is not None else None
+    chunks = []
+    raw_chunks = iter_chunks(filename, max_bytes=max_bytes, debug=debug)
+    try:
+        for path, chunk in _iter_paths(raw_chunks):
+            chunks.append(chunk)
+            if remaining is not None and path in remaining:
+                # sections are complete only once their end is reached
+                if _is_section_end(chunk) or not _is_section_start(chunk):
+                    remaining.discard(path)
+            if remaining is not None and len(remaining) == 0: break
+            if max_chunks is not None and len(chunks) >= max_chunks: break
+    finally:
+        # close the file now rather than when the generator is collected
+        raw_chunks.close()
+    if level == 0: return chunks
+    return parse_chunks(chunks, level=level, debug=debug)
+
+def load_many(filenames, workers=None, ordered=True, chunks=False, debug=False):
+    """Decompress files in a pool of "workers" threads (one per CPU if None)
+       and yield tuples (filename, data stream) in the order of filenames,
+       or as each file is completed if "ordered" is False. zlib releases
+       the GIL while decompressing, so threads decompress files in parallel
+       without the cost of starting processes and pickling data streams.
+       Set "chunks" to True to yield iterators of the raw chunks of each
+       data stream (cf. data_stream_to_chunks(), including its debug
+       mode) instead. At most two files per thread are held in memory in
+       advance. Errors are raised when
+       the corresponding file is reached."""
+    import collections
+    import multiprocessing.pool
+    try:
+        import queue
+    except ImportError:
+        import Queue as queue # Python 2
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.pool.ThreadPool(workers)
+    pending, completed = collections.deque(), queue.Queue()
+    try:
+        for filename in filenames:
+            pending.append(pool.apply_async(_load_worker, ((filename, debug),),
+                                            callback=None if ordered else completed.put))
+            if len(pending) >= 2*workers:
+                yield _next_loaded(pending, completed, ordered, chunks, debug)
+        while len(pending):
+            yield _next_loaded(pending, completed, ordered, chunks, debug)
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _load_worker(arguments):
+    filename, debug = arguments
+    try:
+        return filename, load(filename, debug), None
+    except Exception as e:
+        return filename, None, e
+
+def _next_loaded(pending, completed, ordered, chunks, debug=False):
+    """Return next result of load_many() or raise its error."""
+    if ordered:
+        filename, data_stream, error = pending.popleft().get()
+    else:
+        filename, data_stream, error = completed.get()
+        pending.pop() # only the number of pending files matters here
+    if error is not None: raise error
+    if not chunks: return filename, data_stream
+    if debug:
+        # the heuristic chunker needs the whole data stream
+        return filename, iter(data_stream_to_chunks(data_stream, debug=True))
+    return filename, _iter_raw_chunks(data_stream)
+
+def _iter_raw_chunks(data_stream, start=0):
+    """Yield the chunks of data_stream_to_chunks() one by one."""
+    for start, name, cont, next_start in _iter_chunk_extents(data_stream, start):
+        yield [start, None, []] if name is None else [start, name, data_stream[cont:next_start]]
 
 #####################################
 #
 #       Data stream functions
 #
 
-def data_stream_to_chunks(data_stream, start=0, debug=False):
+def data_stream_to_chunks(data_stream, start=0, debug=False, with_hashes=False):
     """Get all elements and associated data without decoding data beyond length information.
-       Parameter "start" is the beginning of the file marker."""
+       Parameter "start" is the beginning of the file marker.
+       Set with_hashes to True to return a tuple of chunks and the section
+       tree with content hashes (cf. section_tree()) computed in the same pass."""
     # we need to find the beginning of the file.
     #  (We expect 'start' to be at index 4, but it doesn't matter here.)
 
-    if debug: return _data_stream_to_chunks_debug(data_stream, start)
+    if debug:
+        chunks = _data_stream_to_chunks_debug(data_stream, start)
+        return (chunks, section_tree(data_stream, start)) if with_hashes else chunks
+
+    if with_hashes:
+        tree = []
+        chunks = [[address, None, []] if name is None else [address, name, data_stream[cont:next_start]]
+                  for address, name, cont, next_start, _ in _iter_hashed_extents(data_stream, start, tree)]
+        return chunks, tree
 
     chunks=[]
     next_start = start+4 # skip byte header
     while next_start < len(data_stream):
         # get start index of this element
         start = next_start
-
-        if _ord(data_stream[start]) == 0xFF:
+        name, cont, next_start = _get_chunk_extent(data_stream, start)
+        if name is None:
             # indicator ending a 0xDD section
             chunks.append([start, None, []])
-            next_start += 1
-            continue
-
-        # get element name
-        #   and place of continuation (either data block or next element)
-        name, cont = _get_byte_str(data_stream, start)
-
-        # skip associated data block, if any
-        if cont >= len(data_stream):
-            # end of file
-            next_start = len(data_stream)
         else:
-            data_type = _ord(data_stream[cont])
-            if data_type == 0xee:
-                next_start = _skip_past_data_ee(data_stream, cont)
-            elif data_type == 0xaa:
-                next_start = _skip_past_data_aa(data_stream, cont)
-            elif data_type == 0x00:
-                next_start = _skip_past_data_00(data_stream, cont)
-            elif data_type == 0xdd:
-                next_start = _skip_past_data_dd(data_stream, cont)
-            else:
-                next_start = _skip_past_number_type(data_stream, cont)
-                if next_start is None:
-                    # presumably, that was a chunk type without data.
-                    next_start = cont
-
-        chunks.append([start, name, data_stream[cont:next_start]])
+            chunks.append([start, name, data_stream[cont:next_start]])
 
     return chunks
 
+def _iter_chunk_extents(data_stream, start=0):
+    """Yield tuples (start, name, start of data block, start of next chunk)
+       for all chunks without copying data, cf. data_stream_to_chunks()."""
+    next_start = start+4 # skip byte header
+    while next_start < len(data_stream):
+        start = next_start
+        name, cont, next_start = _get_chunk_extent(data_stream, start)
+        yield start, name, cont, next_start
+
+def _iter_hashed_extents(data_stream, start, tree):
+    """Yield the tuples of _iter_chunk_extents() with the section node
+       (or None) as fifth element, and append top-level sections to "tree".
+       The hash of a section is set when its end has been read."""
+    view = memoryview(data_stream)
+    stack = [] # tuples of open section node and hash object
+    for start, name, cont, next_start in _iter_chunk_extents(data_stream, start):
+        node = None
+        if name is None:
+            if len(stack): _close_section(stack, view[start:next_start])
+        elif cont < len(data_stream) and _ord(data_stream[cont]) == 0xDD:
+            path = stack[-1][0]['path']+u'/'+name if len(stack) else name
+            node = {'name': name, 'path': path, 'address': start, 'hash': None, 'children': []}
+            (stack[-1][0]['children'] if len(stack) else tree).append(node)
+            stack.append((node, _hashlib.sha224(view[start:next_start])))
+        elif len(stack):
+            stack[-1][1].update(view[start:next_start])
+        yield start, name, cont, next_start, node
+    while len(stack):
+        # sections that are not closed
+        _close_section(stack, b'')
+
+def _close_section(stack, end_chunk):
+    node, sha = stack.pop()
+    sha.update(end_chunk)
+    node['hash'] = sha.hexdigest()
+    if len(stack): stack[-1][1].update(sha.digest())
+
+def _get_chunk_extent(data_stream, start):
+    """Return name, start of data block, and start of the next chunk for the
+       chunk beginning at index "start". Name is None for End-of-Section chunks."""
+    if _ord(data_stream[start]) == 0xFF:
+        # indicator ending a 0xDD section
+        return None, start+1, start+1
+
+    # get element name
+    #   and place of continuation (either data block or next element)
+    name, cont = _get_byte_str(data_stream, start)
+
+    # skip associated data block, if any
+    if cont >= len(data_stream):
+        # end of file
+        next_start = len(data_stream)
+    else:
+        data_type = _ord(data_stream[cont])
+        if data_type == 0xee:
+            next_start = _skip_past_data_ee(data_stream, cont)
+        elif data_type == 0xaa:
+            next_start = _skip_past_data_aa(data_stream, cont)
+        elif data_type == 0x00:
+            next_start = _skip_past_data_00(data_stream, cont)
+        elif data_type == 0xdd:
+            next_start = _skip_past_data_dd(data_stream, cont)
+        else:
+            next_start = _skip_past_number_type(data_stream, cont)
+            if next_start is None:
+                # presumably, that was a chunk type without data.
+                next_start = cont
+    return name, cont, next_start
+
 def _data_stream_to_chunks_debug(data_stream, start=0):
     """Use this function if unknown chunk types appear.
        This function is not robust and may identify
@@ -117,6 +329,9 @@ def _data_stream_to_chunks_debug(data_stream, start=0):
         start = next_start
         name, cont = _get_byte_str(data_stream, start)
         next_start = _find_next_parameter(data_stream, cont)
+        if next_start is None:
+            # no further chunk
+            next_start = len(data_stream)
 
         chunks.append([start, name, data_stream[cont:next_start]])
 
@@ -147,7 +362,7 @@ def get_data_stream_hex_dump(data_stream, start, rows=4, bytes_per_row=16):
 def _has_file_marker(data_stream):
     """Check data stream for 0xDEADBEAF file marker"""
     file_marker = _struct.pack("<"+_fmt_map['L'], 0xdeadbeaf)
-    return data_stream.startswith(file_marker)
+    return data_stream[:len(file_marker)] == file_marker
 
 def _has_extended_header(data_stream):
     """Check if the first chunk does not start at the 4th byte in the data stream."""
@@ -278,6 +493,67 @@ def _get_data_list(data_stream, item_length, start, raise_error_if_string=True):
         if error: return None, start
         return strings,data_end
 
+#####################################
+#
+#       Chunk paths
+#
+
+def get_paths(chunks):
+    """Return list of paths of raw or parsed chunks. A path consists of the
+       names of all enclosing sections and the name of the chunk, separated
+       by '/'. End-of-Section chunks have the path of the section they end."""
+    return [path for path, chunk in _iter_paths(chunks)]
+
+def _iter_paths(chunks):
+    """Yield tuples of (path, chunk)."""
+    names = []
+    for chunk in chunks:
+        if _is_section_end(chunk):
+            path = u'/'.join(names)
+            if len(names): names.pop()
+        else:
+            names.append(chunk[1])
+            path = u'/'.join(names)
+            if not _is_section_start(chunk): names.pop()
+        yield path, chunk
+
+def section_tree(data_stream, start=0):
+    """Return list of top-level sections of the data stream with content
+       hashes. A section is a dict with keys 'name', 'path', 'address',
+       'hash', and 'children' (list of sections). The hash covers the raw
+       bytes of all chunks of the section and the hashes of its subsections,
+       i.e., sections form a Merkle tree. The tree can be stored as JSON."""
+    tree = []
+    for _ in _iter_hashed_extents(data_stream, start, tree): pass
+    return tree
+
+def find_sections(tree, path):
+    """Return list of sections of section tree with the given path."""
+    path = _normalize_path(path)
+    found, nodes = [], tree
+    while len(nodes):
+        matches = [node for node in nodes if path == node['path'] or path.startswith(node['path']+u'/')]
+        found.extend(node for node in matches if node['path'] == path)
+        nodes = [child for node in matches for child in node['children']]
+    return found
+
+def _is_section_start(chunk):
+    """Test if raw or parsed chunk is of data type 0xDD."""
+    if len(chunk) == 3:
+        return chunk[1] is not None and len(chunk[2])>0 and _ord(chunk[2][0]) == 0xDD
+    return chunk[2] == u'DD'
+
+def _is_section_end(chunk):
+    """Test if raw or parsed chunk is an End-of-Section chunk."""
+    if len(chunk) == 3:
+        return chunk[1] is None
+    return chunk[2] == u'end'
+
+def _normalize_path(path):
+    """Remove leading './' and slashes from path."""
+    if path.startswith('./'): path = path[2:]
+    return path.strip('/')
+
 #####################################
 #
 #       Chunk (data) functions
@@ -689,47 +965,49 @@ def _parse_record(grammar, data, strict_unsigned = None):
         result = success, parsed_fmt, parsed_data, residual
     return result
 
+_QS_FORMATS = {'QS_Par':['B=1:B4B'],
+               'QS_ValPar':['B=1:BdSH(d)(B)B'],
+               'QS_TextPar':['B=1:B4S'],
+               'QS_SelPar':['B=2:BL(L)4S'],
+               'QS_ValArrPar':['B=2:BSHB(L)'],
+               'QS_ValArrParElem':['B=2:B(Ld)'],
+               'QS_ArrPar':['B=2:B(L)B'],
+               'QS_ParProp':['B=7:B9BH9S3H5SL=0:B9BH9S3H5SL2HBS4B',
+                             'B=7:B9BH9S3H5SL=2:B9BH9S3H5SL2HBLS4B',
+                             'B=8:B9BH*'],
+               'QS_ValProp':['B=1:B4B'],
+               'QS_TextProp':['B=1:B8B'],
+               'QS_SelProp':['B=4:B3B2(4S)2(S)(H)(L)(S)','B=4:B3B',
+                             'B=5:B3B2(4S)2(S)(H)(L)(S)B','B=5:B4B'],
+               'QS_ValArrParProp':['B=2:B4BH4B'],
+               'QS_SkalProp':['B=2:B2S2B'],
+               'QS_ValSetting':['B=2:B2SLS3BH2B(H)(S)11B'],
+               'QS_NumFmt':['B=2:B4Bd'],
+               'QS_Plaus':['B=1:B9B6BH6BH6B'],
+               'QS_Tol':['B=1:B9B6BH6BH3B'],
+               }
+
 def _parse_record_data_ee11_formats_QS(name, data, debug=False):
-    fmt={'QS_Par':['B=1:B4B'],
-         'QS_ValPar':['B=1:BdSH(d)(B)B'],
-         'QS_TextPar':['B=1:B4S'],
-         'QS_SelPar':['B=2:BL(L)4S'],
-         'QS_ValArrPar':['B=2:BSHB(L)'],
-         'QS_ValArrParElem':['B=2:B(Ld)'],
-         'QS_ArrPar':['B=2:B(L)B'],
-         'QS_ParProp':['B=7:B9BH9S3H5SL=0:B9BH9S3H5SL2HBS4B',
-                       'B=7:B9BH9S3H5SL=2:B9BH9S3H5SL2HBLS4B',
-                       'B=8:B9BH*'],
-         'QS_ValProp':['B=1:B4B'],
-         'QS_TextProp':['B=1:B8B'],
-         'QS_SelProp':['B=4:B3B2(4S)2(S)(H)(L)(S)','B=4:B3B',
-                       'B=5:B3B2(4S)2(S)(H)(L)(S)B','B=5:B4B'],
-         'QS_ValArrParProp':['B=2:B4BH4B'],
-         'QS_SkalProp':['B=2:B2S2B'],
-         'QS_ValSetting':['B=2:B2SLS3BH2B(H)(S)11B'],
-         'QS_NumFmt':['B=2:B4Bd'],
-         'QS_Plaus':['B=1:B9B6BH6BH6B'],
-         'QS_Tol':['B=1:B9B6BH6BH3B'],
-         }
-
-    grammar = fmt.get(name,'*') # get specific grammar or use default
+    grammar = list(_QS_FORMATS.get(name,'*')) # get specific grammar or use default
     # if all fails, ensure success through linear heuristic interpretation
     if grammar[-1] != '*': grammar.append('*')
     success, parsed_fmt, parsed_data, residual = _parse_record(grammar, bytearray(data), strict_unsigned=False)
     if not success or len(residual):
         # this should never be reached as long as we parse with '*' or '.'
         raise ValueError('Unexpected parse error of EE11 for %r with %r' % (name, data))
-    if debug:
+    if debug and _is_heuristic(name, parsed_fmt):
         # Raise awareness of application of heuristics
-        actual = expand_format(parsed_fmt)
-        for option in grammar:
-            requested = expand_format(option.split(':')[-1])
-            if actual == requested: break
-        else:
-            print('Applied heuristic format %s for %s with %s' %
-                  (parsed_fmt, name, repr(data)[:200]+('...' if len(repr(data))>200 else '')))
+        print('Applied heuristic format %s for %s with %s' %
+              (parsed_fmt, name, repr(data)[:200]+('...' if len(repr(data))>200 else '')))
     return parsed_data, (('EE11-%s' % parsed_fmt) if len(parsed_fmt) else 'EE11')
 
+def _is_heuristic(name, parsed_fmt):
+    """Test if a QS_* record was parsed by none of the formats defined for it."""
+    actual = expand_format(parsed_fmt)
+    for option in _QS_FORMATS.get(name,'*'):
+        if actual == expand_format(option.split(':')[-1]): return False
+    return True
+
 def _parse_record_data_ee11_formats_Entry(data, debug=False):
     """Provisional decoder for Entry record format.
     Note that output format is subject to change."""
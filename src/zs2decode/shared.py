@@ -0,0 +1,126 @@
+"""Parse many files in parallel processes without pickling large arrays.
+
+Worker processes decompress and parse files as by spill.load_chunks().
+The data of numeric arrays of data type 0xEE (sub-types 0x04, 0x05, and
+0x16) that are larger than "threshold" bytes are not decoded and pickled
+but written unchanged to one file per zs2 file, so that only the
+positions of the arrays are passed to the parent process. The parent
+maps this file into memory and returns the arrays as read-only numpy
+views of the memory map. As in module spill, single-precision arrays
+(0x04) hold the values as stored in the file, i.e., they are not rounded
+to the shortest decimal representation as by parser.parse_chunks().
+
+The files are created in a temporary directory inside "directory" (or
+the default location of the tempfile module), which is removed when all
+files have been processed or when processing is interrupted. A file is
+deleted as soon as it has been mapped into memory, so the arrays remain
+valid without leaving files behind. On systems that do not allow removal
+of mapped files, the arrays are copied into memory instead. Choose a
+directory on a RAM disk (e.g., /dev/shm) to avoid writing to disk.
+
+Requires numpy in the parent process.
+"""
+
+import mmap as _mmap
+import os as _os
+import shutil as _shutil
+import struct as _struct
+import tempfile as _tempfile
+
+import zs2decode.parser as _parser
+import zs2decode.spill as _spill
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+_THRESHOLD = 65536
+
+#####################################
+#
+#       File functions
+#
+
+def iter_load_chunks(filenames, processes=None, level=None, threshold=_THRESHOLD,
+                     directory=None, debug=False):
+    """Parse files in "processes" processes (all CPUs if None) and yield
+       tuples (filename, parsed chunks) in the order of filenames. Numeric
+       arrays larger than "threshold" bytes are numpy arrays."""
+    import multiprocessing
+    import numpy
+    path = _tempfile.mkdtemp(prefix='zs2-', dir=directory)
+    pool = multiprocessing.Pool(processes)
+    try:
+        arguments = [(filename, level, threshold, path, debug) for filename in filenames]
+        for filename, result in zip(filenames, pool.imap(_worker, arguments)):
+            yield filename, _attach(numpy, result)
+    finally:
+        pool.terminate()
+        pool.join()
+        _shutil.rmtree(path, ignore_errors=True)
+
+def load_chunks(filenames, processes=None, level=None, threshold=_THRESHOLD,
+                directory=None, debug=False):
+    """Return dict mapping file names to parsed chunks, cf. iter_load_chunks()."""
+    return dict(iter_load_chunks(filenames, processes, level, threshold, directory, debug))
+
+#####################################
+#
+#       Helper functions
+#
+
+def _worker(arguments):
+    """Return tuple (chunks, name of array file or None, list of (index,
+       type code, offset, count) of the arrays in the file)."""
+    filename, level, threshold, directory, debug = arguments
+    fd, path = _tempfile.mkstemp(suffix='.bin', dir=directory)
+    chunks, arrays, batch = [], [], []
+    completed = False
+    try:
+        with _os.fdopen(fd, 'wb') as f:
+            for raw_chunk in _parser.data_stream_to_chunks(_parser.load(filename, debug), debug=debug):
+                address, name, data = raw_chunk
+                sub_type = _array_sub_type(data) if name is not None and len(data) > threshold else None
+                if sub_type is None:
+                    batch.append(raw_chunk)
+                    continue
+                chunks.extend(_parser.parse_chunks(batch, level or 3, debug))
+                batch = []
+                count = _struct.unpack('<'+_parser._fmt_map['L'], bytes(data[3:7]))[0]
+                arrays.append((len(chunks), u'EE%0.2X' % sub_type, f.tell(), count))
+                chunks.append([address, name, u'EE%0.2X' % sub_type, None])
+                f.write(data[7:])
+                f.write(b'\0' * (-(len(data)-7) % 8)) # keep arrays aligned
+            chunks.extend(_parser.parse_chunks(batch, level or 3, debug))
+        completed = True
+    finally:
+        if not completed: _os.remove(path)
+    if len(arrays) == 0:
+        _os.remove(path)
+        path = None
+    return chunks, path, arrays
+
+def _array_sub_type(data):
+    """Return EE sub-type of raw chunk data if it is a numeric array."""
+    if _parser._ord(data[0]) != 0xEE: return None
+    sub_type = _struct.unpack('<'+_parser._fmt_map['H'], bytes(data[1:3]))[0]
+    return sub_type if sub_type in _spill._DTYPES else None
+
+def _attach(numpy, result):
+    """Return chunks with arrays mapped from the file of the worker."""
+    chunks, path, arrays = result
+    if path is None: return chunks
+    with open(path, 'rb') as f:
+        mapped = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+    try:
+        _os.remove(path) # the memory map remains valid
+        data = numpy.frombuffer(mapped, dtype=numpy.uint8)
+    except OSError:
+        # e.g., on Windows: copy into memory and release the file
+        data = numpy.frombuffer(mapped[:], dtype=numpy.uint8)
+        mapped.close()
+        _os.remove(path)
+    for index, type_code, offset, count in arrays:
+        dtype = numpy.dtype(_spill._DTYPES[int(type_code[2:], 16)])
+        chunks[index][3] = data[offset:offset+count*dtype.itemsize].view(dtype)
+    return chunks
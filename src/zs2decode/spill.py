@@ -0,0 +1,98 @@
+"""Parse large zs2 files with bounded memory.
+
+The file is decompressed and parsed incrementally (cf. parser.iter_chunks()).
+Numeric arrays of chunks with data type 0xEE (sub-types 0x04, 0x05, and
+0x16) that are larger than "threshold" bytes are not kept in memory but
+copied to temporary files while they are read, and returned as read-only
+numpy.memmap arrays in place of the usual lists. All other chunks are
+parsed as by parser.parse_chunks(). The memory required is therefore
+determined by the threshold and the size of the remaining chunks rather
+than by the size of the file. Note that single-precision arrays hold the
+values as stored in the file, i.e., they are not rounded to the shortest
+decimal representation as by parser.parse_chunks(). Arrays are only
+replaced at parse level 2 or higher, since level 1 does not decode them.
+
+Temporary files are created in "directory" (or the default location of
+the tempfile module) and are deleted by the operating system once the
+arrays referencing them have been garbage collected.
+
+Requires numpy.
+"""
+
+import struct as _struct
+import tempfile as _tempfile
+import gzip as _gzip
+
+import zs2decode.parser as _parser
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+_THRESHOLD = 16*2**20
+_BATCH = 1000   # number of small chunks parsed at once
+_COPY_SIZE = 2**20
+
+# numpy data types of numeric EE sub-types
+_DTYPES = {0x04:'<f4', 0x05:'<f8', 0x16:'<u4'}
+
+#####################################
+#
+#       File functions
+#
+
+def iter_chunks(filename, level=None, threshold=_THRESHOLD, directory=None, block_size=65536, debug=False):
+    """Open file and yield parsed chunks (cf. parser.parse_chunks()).
+       Numeric arrays larger than "threshold" bytes are returned as
+       numpy.memmap backed by temporary files in "directory"."""
+    import numpy
+    level = level or 3
+    spill = _make_spill(numpy, threshold, directory) if level >= 2 else None
+    batch = []
+    with _gzip.open(filename, 'rb') as f:
+        for chunk in _parser._iter_chunks(f.read, 0, block_size, debug=debug, spill=spill):
+            if spill is not None and chunk[1] is not None and len(chunk[2]) > threshold:
+                # array that fits into the read buffer
+                chunk[2] = spill(chunk[1], chunk[2], 0, None) or chunk[2]
+            if not isinstance(chunk[2], tuple):
+                batch.append(chunk)
+                if len(batch) < _BATCH: continue
+            for parsed in _parser.parse_chunks(batch, level, debug):
+                yield parsed
+            batch = []
+            if isinstance(chunk[2], tuple):
+                type_code, array = chunk[2]
+                yield [chunk[0], chunk[1], type_code, array]
+    for parsed in _parser.parse_chunks(batch, level, debug):
+        yield parsed
+
+def load_chunks(filename, level=None, threshold=_THRESHOLD, directory=None, debug=False):
+    """Open file and return list of parsed chunks, cf. iter_chunks()."""
+    return list(iter_chunks(filename, level, threshold, directory, debug=debug))
+
+#####################################
+#
+#       Helper functions
+#
+
+def _make_spill(numpy, threshold, directory):
+    """Return function for parser._iter_chunks() that copies numeric
+       arrays above threshold to temporary files."""
+    def spill(name, data, remaining, read):
+        if len(data)+remaining <= threshold or len(data) < 7: return None
+        if _parser._ord(data[0]) != 0xEE: return None
+        sub_type, count = _struct.unpack('<'+_parser._fmt_map['H']+_parser._fmt_map['L'], bytes(data[1:7]))
+        if sub_type not in _DTYPES or count == 0: return None
+        with _tempfile.TemporaryFile(dir=directory) as f:
+            f.write(data[7:])
+            while remaining > 0:
+                piece = read(min(remaining, _COPY_SIZE))
+                if len(piece) == 0:
+                    raise ValueError('Data stream ends within chunk "%s".' % name)
+                f.write(piece)
+                remaining -= len(piece)
+            f.flush()
+            # the memory map remains valid after the file is closed
+            array = numpy.memmap(f, dtype=_DTYPES[sub_type], mode='r', shape=(count,))
+        return u'EE%0.2X' % sub_type, array
+    return spill
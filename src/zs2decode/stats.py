@@ -0,0 +1,183 @@
+"""Timing and counters of the stages of decoding and output.
+
+enable() replaces the functions of the stages listed below by timed
+versions until disable() is called, so that instrumentation costs nothing
+while it is disabled:
+
+    load                   parser.load() (decompression)
+    data_stream_to_chunks  parser.data_stream_to_chunks()
+    parse_chunks           parser.parse_chunks(), and its levels as
+    parse_chunks/1         parse_chunks/1 (data types),
+    parse_chunks/2         parse_chunks/2 (EE sub-types), and
+    parse_chunks/3         parse_chunks/3 (EE11 records)
+    ee11_grammar           matching of a single EE11 record to its formats
+    chunks_to_XML          util.chunks_to_XML()
+    write_text_dump        util.write_text_dump() and chunks_to_text_dump()
+
+Statistics are collected in a dict with keys
+
+    'stages'       dict mapping stage names to dicts with keys 'calls',
+                   'seconds' (wall time), 'bytes', and 'chunks'
+    'chunk_types'  dict mapping type codes (without EE11 record formats) to
+                   the number of chunks returned by parser.parse_chunks()
+    'heuristics'   dict mapping chunk names to the number of QS_* records
+                   that matched none of their formats and were interpreted
+                   heuristically
+    'cache'        dict with the numbers of 'hits' and 'misses' of module
+                   cache (parsed chunks and memory-mapped data streams)
+
+For write_text_dump, 'bytes' is the number of bytes written. Optionally,
+function hook(stage, seconds, bytes, chunks) is called after every stage.
+Stages of nested calls are timed individually, i.e., the time of
+parse_chunks includes that of its levels. Work done in other processes
+is not recorded.
+
+Note that enable() replaces module-level functions for the whole process.
+Calls of these functions in other threads are recorded as well, and
+threads that call them while enable() or disable() is running may call
+either version, so do not start or stop recording while other threads
+decode files.
+
+    with stats.collect() as statistics:
+        encoder.zs2_to_xml('test.zs2')
+    print(statistics['stages']['load']['seconds'])
+"""
+
+import contextlib as _contextlib
+import time as _time
+
+import zs2decode.parser as _parser
+import zs2decode.util as _util
+import zs2decode.cache as _cache
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+_clock = getattr(_time, 'perf_counter', _time.time)
+
+# original functions replaced while enabled, as (module, name, function)
+_originals = []
+
+#####################################
+#
+#       Collection
+#
+
+def enable(hook=None):
+    """Start recording statistics and return the dict they are recorded in."""
+    if len(_originals):
+        raise RuntimeError('Statistics are already being recorded.')
+    stats = {'stages': {}, 'chunk_types': {}, 'heuristics': {}, 'cache': {'hits': 0, 'misses': 0}}
+    for module, name, stage, measure in _stages():
+        function = _timed(getattr(module, name), stage, measure, stats, hook)
+        if stage == 'write_text_dump': function = _with_counting_file(function)
+        _replace(module, name, function)
+    for name in ('_read_entry', '_map_entry'):
+        _replace(_cache, name, _counted(getattr(_cache, name), stats['cache']))
+    return stats
+
+def disable():
+    """Stop recording statistics."""
+    while len(_originals):
+        module, name, function = _originals.pop()
+        setattr(module, name, function)
+
+@_contextlib.contextmanager
+def collect(hook=None):
+    """Context manager that records statistics within its block."""
+    stats = enable(hook)
+    try:
+        yield stats
+    finally:
+        disable()
+
+#####################################
+#
+#       Helper functions
+#
+
+def _stages():
+    """Return list of (module, function name, stage, measure), where
+       measure(stats, args, result) returns bytes and chunks processed."""
+    length = lambda stats, args, result: (0, len(result))
+    return [(_parser, 'load', 'load', lambda stats, args, result: (len(result), 0)),
+            (_parser, 'data_stream_to_chunks', 'data_stream_to_chunks', _measure_chunking),
+            (_parser, 'parse_chunks', 'parse_chunks', _measure_parsing),
+            (_parser, '_parse_chunk_types', 'parse_chunks/1', length),
+            (_parser, '_parse_chunk_ee_subtypes', 'parse_chunks/2', length),
+            (_parser, '_parse_chunk_ee11_data_records', 'parse_chunks/3', length),
+            (_parser, '_parse_record_data_ee11_formats_QS', 'ee11_grammar', _measure_record),
+            (_parser, '_parse_record_data_ee11_formats_Entry', 'ee11_grammar',
+             lambda stats, args, result: (len(args[0]), 1)),
+            (_util, 'chunks_to_XML', 'chunks_to_XML', lambda stats, args, result: (len(result), len(args[0]))),
+            (_util, 'write_text_dump', 'write_text_dump', lambda stats, args, result: (args[1].bytes, args[1].chunks))]
+
+def _replace(module, name, function):
+    _originals.append((module, name, getattr(module, name)))
+    setattr(module, name, function)
+
+def _timed(function, stage, measure, stats, hook):
+    def timed(*args, **kwargs):
+        started = _clock()
+        result = function(*args, **kwargs)
+        seconds = _clock()-started
+        size, chunks = measure(stats, args, result)
+        record = stats['stages'].setdefault(stage, {'calls': 0, 'seconds': 0., 'bytes': 0, 'chunks': 0})
+        record['calls'] += 1
+        record['seconds'] += seconds
+        record['bytes'] += size
+        record['chunks'] += chunks
+        if hook is not None: hook(stage, seconds, size, chunks)
+        return result
+    return timed
+
+def _with_counting_file(function):
+    """Return function(chunks, fp, ...) that passes a _CountingFile in place
+       of fp to count the bytes written, and the chunks."""
+    def with_counting_file(chunks, fp, *args, **kwargs):
+        fp = _CountingFile(fp)
+        if isinstance(chunks, list):
+            fp.chunks = len(chunks)
+        else:
+            chunks = fp.count(chunks)
+        return function(chunks, fp, *args, **kwargs)
+    return with_counting_file
+
+class _CountingFile(object):
+    """Binary file object that counts the bytes written to file fp."""
+    def __init__(self, fp):
+        self.fp, self.bytes, self.chunks = fp, 0, 0
+    def write(self, data):
+        self.bytes += len(data)
+        return self.fp.write(data)
+    def count(self, chunks):
+        for chunk in chunks:
+            self.chunks += 1
+            yield chunk
+
+def _counted(function, counts):
+    """Count cache hits (result is not None) and misses."""
+    def counted(*args, **kwargs):
+        result = function(*args, **kwargs)
+        counts['misses' if result is None else 'hits'] += 1
+        return result
+    return counted
+
+def _measure_chunking(stats, args, result):
+    chunks = result[0] if isinstance(result, tuple) else result
+    return len(args[0]), len(chunks)
+
+def _measure_parsing(stats, args, result):
+    chunk_types = stats['chunk_types']
+    for chunk in result:
+        type_code = chunk[2].split('-', 1)[0]
+        chunk_types[type_code] = chunk_types.get(type_code, 0)+1
+    return 0, len(result)
+
+def _measure_record(stats, args, result):
+    name, data = args[0], args[1]
+    type_code = result[1]
+    if _parser._is_heuristic(name, type_code[5:]):
+        stats['heuristics'][name] = stats['heuristics'].get(name, 0)+1
+    return len(data), 1
@@ -1,4 +1,5 @@
 """Output functions for parsed zs2 chunks."""
+import io
 import json
 from xml.dom import minidom
 import zs2decode.parser as parser
@@ -62,14 +63,17 @@ def chunks_to_XML(chunks, with_address=False):
     current = []
     for chunk in chunks:
         address, name, data_type, data = chunk
+        if hasattr(data, 'tolist'):
+            # numpy arrays, e.g. from module spill
+            data = data.tolist()
         if isinstance(data,(int,float,list)):
             # note that 'bool' is derived from 'int'.
             # note that json uses 'true' rather than 'True'
-            display=json.dumps(data, ensure_ascii=False)
+            display=_format_value(data)
         else:
             # create escaped string enclosed in double quotes,
             #  then strip the double quotes
-            display = json.dumps(data, ensure_ascii=False)[1:-1]
+            display = _json_encoder.encode(data)[1:-1]
 
         attrib = {}
         if with_address:
@@ -82,33 +86,107 @@ def chunks_to_XML(chunks, with_address=False):
     return doc.toprettyxml(indent="  ",encoding='UTF-8')
 
 
+def iter_ndjson(chunks, max_items=65536):
+    """Yield one JSON object per chunk (without newline) with keys 'path'
+       (cf. parser.get_paths()), 'address', 'type', and 'value'. Lists
+       with more than "max_items" elements are split into several objects
+       with an additional key 'offset' of the first element. Chunks are
+       parsed chunks and may be an iterator, e.g. from spill.iter_chunks(),
+       so memory use does not depend on the size of the file. Note that
+       special floats are written as NaN, Infinity, and -Infinity, as by
+       the json module."""
+    for path, chunk in parser._iter_paths(chunks):
+        address, name, data_type, data = chunk
+        head = u'{"path": %s, "address": %i, "type": %s, ' % (
+            _json_encoder.encode(path), address, _json_encoder.encode(data_type))
+        is_array = hasattr(data, 'tolist') # numpy arrays
+        if max_items is None or not (is_array or isinstance(data, list)) or len(data) <= max_items:
+            if is_array: data = data.tolist()
+            yield head + u'"value": %s}' % _format_value(data)
+            continue
+        for offset in range(0, len(data), max_items):
+            part = data[offset:offset+max_items]
+            if is_array: part = part.tolist()
+            yield head + u'"offset": %i, "value": %s}' % (offset, _format_value(part))
+
+def write_ndjson(chunks, fp, max_items=65536):
+    """Write chunks to binary file object fp as newline-delimited JSON
+       encoded in UTF-8, cf. iter_ndjson()."""
+    for line in iter_ndjson(chunks, max_items):
+        fp.write(bytearray(line+u'\n', encoding='UTF-8'))
+
+# equivalent to json.dumps(data, ensure_ascii=False) without creating an encoder every time
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+_number_types = set([int, float]) # but not bool
+
+def _format_value(data):
+    """Return JSON representation of data. Numbers and lists of numbers are
+       formatted directly, which is considerably faster than json.dumps()."""
+    if type(data) in _number_types:
+        return _json_floats(repr(data))
+    if type(data) is list and set(map(type, data)) <= _number_types:
+        # same separators as json
+        return _json_floats(repr(data))
+    return _json_encoder.encode(data)
+
+def _json_floats(text):
+    """Replace repr() of special floats by their JSON representation."""
+    if 'n' not in text: return text # neither 'nan' nor 'inf'
+    return text.replace('nan', 'NaN').replace('inf', 'Infinity')
+
 def chunks_to_text_dump(chunks):
     """Produces a string representation."""
-    out=[]
+    with io.BytesIO() as fp:
+        write_text_dump(chunks, fp)
+        return bytearray(fp.getvalue())
+
+def write_text_dump(chunks, fp, max_items=None):
+    """Write the text representation of chunks (cf. chunks_to_text_dump())
+       line by line to binary file object fp. Chunks may be an iterator.
+       Lists with more than "max_items" elements are shortened to their
+       first elements, followed by the number of elements and their range."""
     DD_names = []
     level = 0
 
-    data_types = [chunk[2] for chunk in chunks]
+    if isinstance(chunks, list):
+        data_types = [chunk[2] for chunk in chunks]
+    else:
+        data_types = [] # cannot check in advance
     if data_types.count('DD') != data_types.count('end'):
         # do not indent since there's obviously something wrong
         indent = None
     else:
         indent = '  '
 
-    for chunk in chunks:
+    for idx, chunk in enumerate(chunks):
         address, name, data_type, data = chunk
         if data_type == 'end': level-=1
 
         _space = indent*level if indent is not None else ''
 
         comment = '' if data_type != 'end' else './'+'/'.join(DD_names)
-        if data_type == 'end': DD_names.pop()
+        if data_type == 'end' and len(DD_names): DD_names.pop()
 
-        data_string = repr(data) # Python 2: this escapes unicode characters
+        data_string = _data_repr(data, max_items)
         line = u' '.join([u'%.6x:'%address, _space+name, '[%s]'%data_type, data_string, comment])
 
         if data_type == 'DD':
             DD_names.append(name)
             level+=1
-        out.append(line)
-    return bytearray(u'\n'.join(out), encoding='UTF-8')
+        fp.write(bytearray((u'\n' if idx else u'')+line, encoding='UTF-8'))
+
+def _data_repr(data, max_items=None):
+    """Return repr() of data, with lists shortened to max_items elements."""
+    is_array = hasattr(data, 'tolist') # numpy arrays, e.g. from module spill
+    if max_items is None or not (is_array or isinstance(data, list)) or len(data) <= max_items:
+        if is_array: data = data.tolist()
+        return repr(data) # Python 2: this escapes unicode characters
+    head = data[:max_items].tolist() if is_array else data[:max_items]
+    summary = '%i items' % len(data)
+    try:
+        if is_array: low, high = data.min().item(), data.max().item()
+        else: low, high = min(data), max(data)
+        summary += ', min %r, max %r' % (low, high)
+    except (TypeError, ValueError):
+        pass # not comparable
+    return '%s%s...] (%s)' % (repr(head)[:-1], ', ' if len(head) else '', summary)
@@ -0,0 +1,181 @@
+"""Watch a folder and process new or changed zs2 files.
+
+run() polls a directory, so it works on any OS and on network shares.
+A file is processed once its size and modification time have been
+unchanged for "stable_polls" consecutive polls, i.e., once the testing
+machine has finished writing it. Files are processed in a pool of worker
+processes, either by a function "action" that is called with the file
+name (e.g., functools.partial(channels.export, pattern=...)), or by adding
+them to a catalog database (cf. module catalog), or both.
+
+Completed files are recorded in a journal, a text file with one JSON
+record {"path", "size", "mtime", "error"} per line, so that a restarted
+service skips files that have not changed since they were processed.
+Files that failed are recorded with the error message and are not tried
+again until they change. The journal is compacted to the latest record of
+every file when the service starts.
+"""
+
+import fnmatch as _fnmatch
+import io as _io
+import json as _json
+import os as _os
+import time as _time
+
+import zs2decode.catalog as _catalog
+
+# Author: Chris Petrich
+# Copyright: Copyright 2015-2025, Chris Petrich
+# License: MIT
+
+# os.rename does not overwrite existing files on Windows
+_replace = getattr(_os, 'replace', _os.rename)
+
+#####################################
+#
+#       Service
+#
+
+def run(directory, action=None, database=None, journal=None, interval=10.,
+        stable_polls=2, pattern='*.zs2', recursive=False, processes=None,
+        max_polls=None, debug=False):
+    """Poll "directory" every "interval" seconds and process files matching
+       "pattern" that are new or have changed. Files are processed in
+       "processes" worker processes (all CPUs if None, none if 1). Runs
+       until interrupted, or for "max_polls" polls, in which case it returns
+       dict mapping the files processed to None or the exception raised."""
+    if action is None and database is None:
+        raise ValueError('Nothing to do: specify action or database.')
+    if journal: _compact_journal(journal)
+    state = {'seen': {}, 'done': read_journal(journal) if journal else {}}
+    # results are not kept by a service that runs until interrupted
+    pending, out = {}, {} if max_polls is not None else None
+    pool = None
+    if processes != 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+    try:
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            if polls: _time.sleep(interval)
+            polls += 1
+            for path, identity in _poll(directory, state, pattern, recursive, stable_polls):
+                if path in pending: continue
+                arguments = (path, action, database is not None, debug)
+                if pool is None:
+                    _finish(path, identity, _work(arguments), database, journal, state, out)
+                else:
+                    pending[path] = identity, pool.apply_async(_work, (arguments,))
+            while len(pending):
+                # collect results; wait for them on the last poll
+                finished = [path for path in pending if pending[path][1].ready()]
+                for path in finished:
+                    identity, result = pending.pop(path)
+                    _finish(path, identity, result.get(), database, journal, state, out)
+                if max_polls is None or polls < max_polls: break
+                if len(finished) == 0: _time.sleep(0.05)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return out
+
+def read_journal(filename):
+    """Return dict mapping paths to (size, mtime) of the latest record of
+       each path in journal, or empty dict if there is no journal."""
+    records, _ = _read_records(filename)
+    return dict((path, (record['size'], record['mtime'])) for path, record in records.items())
+
+#####################################
+#
+#       Helper functions
+#
+
+def _read_records(filename):
+    """Return dict mapping paths to the latest record of each path in
+       journal, and the number of lines read."""
+    records, lines = {}, 0
+    if not _os.path.exists(filename): return records, lines
+    with _io.open(filename, 'rt', encoding='UTF-8') as f:
+        for line in f:
+            lines += 1
+            try:
+                record = _json.loads(line)
+            except ValueError:
+                continue # e.g., incomplete last line
+            records[record['path']] = record
+    return records, lines
+
+def _compact_journal(filename):
+    """Rewrite journal with only the latest record of each path."""
+    records, lines = _read_records(filename)
+    if lines == len(records): return
+    temporary = '%s.%i.tmp' % (filename, _os.getpid())
+    with _io.open(temporary, 'wt', encoding='UTF-8') as f:
+        for path in sorted(records):
+            f.write(u'%s\n' % _json.dumps(records[path], ensure_ascii=False))
+    _replace(temporary, filename)
+
+def _scan(directory, pattern, recursive):
+    """Return dict mapping absolute paths of matching files to (size, mtime)."""
+    files = {}
+    for root, dirs, names in _os.walk(directory):
+        for name in _fnmatch.filter(names, pattern):
+            path = _os.path.abspath(_os.path.join(root, name))
+            try:
+                stat = _os.stat(path)
+            except OSError:
+                continue # removed in the meantime
+            files[path] = (stat.st_size, stat.st_mtime)
+        if not recursive: break
+    return files
+
+def _poll(directory, state, pattern, recursive, stable_polls):
+    """Return sorted list of (path, (size, mtime)) of files that have been
+       stable for "stable_polls" polls and have not been processed."""
+    seen = state['seen']
+    ready = []
+    files = _scan(directory, pattern, recursive)
+    for path, identity in files.items():
+        previous, count = seen.get(path, (None, 0))
+        count = count+1 if identity == previous else 1
+        seen[path] = (identity, count)
+        if count >= stable_polls and state['done'].get(path) != identity:
+            ready.append((path, identity))
+    for path in set(seen) - set(files):
+        del seen[path]
+    return sorted(ready)
+
+def _work(arguments):
+    """Process file in worker. Returns catalog data (or None) or the
+       exception raised."""
+    path, action, index, debug = arguments
+    try:
+        result = None
+        if index:
+            result = _catalog._extract((path, debug))
+            if isinstance(result, Exception): return result
+        if action is not None: action(path)
+        return result
+    except Exception as e:
+        return e
+
+def _finish(path, identity, result, database, journal, state, out):
+    """Store result and record file as done."""
+    error = None
+    if isinstance(result, Exception):
+        error = u'%s: %s' % (type(result).__name__, result)
+    elif database is not None:
+        connection = _catalog.connect(database)
+        try:
+            _catalog._store(connection, path, result)
+            _catalog._remove_orphans(connection)
+            connection.commit()
+        finally:
+            connection.close()
+    if journal is not None:
+        record = {'path': path, 'size': identity[0], 'mtime': identity[1], 'error': error}
+        with _io.open(journal, 'at', encoding='UTF-8') as f:
+            f.write(u'%s\n' % _json.dumps(record, ensure_ascii=False))
+    state['done'][path] = identity
+    if out is not None: out[path] = result if error else None
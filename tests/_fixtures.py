@@ -0,0 +1,51 @@
+"""Synthetic chunk lists and temporary files shared by several test modules."""
+import os
+import shutil
+import tempfile
+import unittest
+import zs2decode.builder as builder
+
+class TestCase(unittest.TestCase):
+    """Test case with a temporary directory self.path that is removed
+       after every test."""
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self.path)
+    def save(self, name, chunks):
+        """Save chunks (cf. module builder) to file "name" in self.path and
+           return its path."""
+        filename = os.path.join(self.path, name)
+        builder.save(filename, chunks)
+        return filename
+
+def sample(idx, name, rows):
+    """Return chunks of element idx of SeriesElements with parameters and
+       channels 12, 3 (time), and 7 of "rows" values."""
+    parameters = builder.section('ParameterListe', [
+        builder.section('Elem0', [builder.value('ID', 48154, '22'),
+                                  builder.record('QS_TextPar', 'B4S', [1, name, u'', u'', u''])]),
+        builder.section('Elem1', [builder.value('ID', 100, '22'),
+                                  builder.record('QS_ValPar', 'BdSH(d)(B)B', [1, 12.5+idx, u'mm', 7, [], [], 0])]),
+        ])
+    data_channels = builder.section('DataChannels', [
+        builder.section('Elem%i' % channel, [builder.value('TrsChannelId', ID, '22'),
+                                             builder.array('DataArray', [ID+0.5*row for row in range(rows)])])
+        for channel, ID in enumerate([12, 3, 7])])
+    return builder.section('Elem%i' % idx, [
+        builder.section('EvalContext', [builder.section('ParamContext', [parameters])]),
+        builder.section('SeriesElements', [builder.section('Elem0', [builder.section('RealTimeCapture', [
+            builder.section('Trs', [builder.section('SingleGroupDataBlock', [
+                builder.value('IndexTimeChannel', 1, '22'), data_channels])])])])])])
+
+def sample_chunks(rows=5, names=(u'A', u'')):
+    """Return chunks of a document with samples named "names"."""
+    channel_manager = builder.section('ChannelManager', [
+        builder.section('Elem%i' % idx, [builder.value('ID', ID, '22'),
+                                         builder.section('Name', [builder.value('Text', name)])])
+        for idx, (ID, name) in enumerate([(3, u'Time'), (7, u'Force'), (12, u'Strain')])])
+    return builder.section('Document', [builder.section('Body', [builder.section('batch', [
+        builder.section('SeriesDef', [builder.section('TestTaskDefs', [builder.section('Elem0', [
+            builder.section('ChannelManager', [channel_manager])])])]),
+        builder.section('Series', [builder.section('SeriesElements', [
+            sample(idx, name, rows) for idx, name in enumerate(names)])])])])])
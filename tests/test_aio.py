@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+import zs2decode.parser as parser
+
+if sys.version_info >= (3, 6):
+    import asyncio
+    import zs2decode.aio as aio
+else:
+    aio = None
+
+import _fixtures
+from _fixtures import sample_chunks as _chunks
+
+@unittest.skipIf(aio is None, 'requires Python 3.6')
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.filenames = [self.save('%i.zs2' % idx, _chunks(rows=idx+1)) for idx in range(3)]
+        self.loop = asyncio.new_event_loop()
+    def tearDown(self):
+        self.loop.close()
+        _fixtures.TestCase.tearDown(self)
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+    def _collect(self, chunks):
+        # plain loop over an asynchronous iterator
+        out = []
+        while True:
+            try:
+                out.append(self._run(chunks.__anext__()))
+            except StopAsyncIteration:
+                return out
+    def test_load(self):
+        self.assertEqual(self._run(aio.load(self.filenames[0])), parser.load(self.filenames[0]))
+        chunks = self._run(aio.load_chunks(self.filenames[0]))
+        self.assertEqual(chunks, parser.parse_chunks(parser.data_stream_to_chunks(parser.load(self.filenames[0]))))
+    def test_iter_chunks(self):
+        self.assertEqual(self._collect(aio.iter_chunks(self.filenames[1], batch_size=7)),
+                         parser.data_stream_to_chunks(parser.load(self.filenames[1])))
+    def test_map_files(self):
+        results = self._run(aio.map_files(aio.convert, self.filenames, limit=2, filename_out=None))
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result.startswith(b'<?xml') for result in results))
+        with open(os.path.join(self.path, 'broken.zs2'), 'wb') as f:
+            f.write(b'not a zs2 file')
+        results = self._run(aio.map_files(aio.load, self.filenames[:1]+[f.name], return_exceptions=True))
+        self.assertTrue(isinstance(results[1], Exception))
+        with self.assertRaises(Exception):
+            self._run(aio.map_files(aio.load, [f.name]))
+    def test_cancel(self):
+        chunks = aio.iter_chunks(self.filenames[0], batch_size=1)
+        self.assertEqual(self._run(chunks.__anext__())[1], u'Document')
+        self._run(chunks.aclose())
+        task = self.loop.create_task(aio.map_files(aio.load_chunks, self.filenames, limit=1))
+        self._run(asyncio.sleep(0))
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            self._run(task)
+        self.assertTrue(task.cancelled())
+    @unittest.skipIf(sys.version_info < (3, 9), 'requires Python 3.9')
+    def test_close_after_shutdown(self):
+        chunks = aio.iter_chunks(self.filenames[0], batch_size=1)
+        self.assertEqual(self._run(chunks.__anext__())[1], u'Document')
+        self._run(self.loop.shutdown_default_executor())
+        self._run(chunks.aclose())
+        with self.assertRaises(StopAsyncIteration):
+            self._run(chunks.__anext__())
+
+if __name__ == '__main__':
+    unittest.main()
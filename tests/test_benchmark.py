@@ -0,0 +1,41 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'benchmark.py')
+_NAME = 'zs2decode_benchmark'
+
+def _load():
+    # load by file name, so that nothing is added to sys.path
+    if sys.version_info < (3, 5):
+        import imp
+        return imp.load_source(_NAME, _PATH)
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(_NAME, _PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.benchmark = _load()
+    def tearDown(self):
+        sys.modules.pop(_NAME, None)
+    def test_run(self):
+        benchmark = self.benchmark
+        results = benchmark.run(scale=0.001, repeat=1)
+        self.assertEqual(sorted(results['results']), ['arrays', 'audit_log', 'parameters', 'small_chunks'])
+        seconds = results['results']['parameters']['seconds']
+        self.assertEqual(sorted(seconds), ['chunks_to_XML', 'chunks_to_text_dump', 'data_stream_to_chunks',
+                                           'encode', 'load', 'parse_chunks/1', 'parse_chunks/2',
+                                           'parse_chunks/3'])
+        counters = results['results']['parameters']['counters']
+        self.assertEqual(counters['data_stream_to_chunks']['chunks'], results['results']['parameters']['chunks'])
+        lines = benchmark.compare(results, results)
+        self.assertTrue(len(lines) > 0)
+        self.assertFalse(any(line.endswith('<--') for line in lines))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import array
+import os
+import shutil
+import tempfile
+import unittest
+import zs2decode.parser as parser
+import zs2decode.encoder as encoder
+import zs2decode.builder as builder
+
+class Test(unittest.TestCase):
+    def test_chunks(self):
+        chunks = builder.section('Document', [
+                    builder.section('Header', [
+                        builder.value('Flag', True),
+                        builder.value('Version', 3),
+                        builder.value('Percent', 0.5, 'BB'),
+                        builder.value('FileName', u'test.zs2')]),
+                    builder.section('Empty'),
+                    builder.array('DataArray', [0., 0.5]),
+                    builder.array('Singles', array.array('f', [0.25, 1.5])),
+                    builder.array('Counts', [1, 2], 'EE16'),
+                    builder.record('QS_TextPar', 'B4S', [1, u'Sample A', u'', u'', u'']),
+                    ])
+        data_stream = builder.to_data_stream(chunks)
+        parsed = parser.parse_chunks(parser.data_stream_to_chunks(data_stream))
+        self.assertEqual([chunk[1:3] for chunk in parsed], [chunk[1:3] for chunk in chunks])
+        self.assertEqual([chunk[3] for chunk in parsed[:7]], [chunk[3] for chunk in chunks[:7]])
+        self.assertEqual(parsed[10][3], [0.25, 1.5])
+        self.assertEqual(parsed[12][3], [1, u'Sample A', u'', u'', u''])
+        self.assertEqual(encoder.make_datastream(encoder.make_raw_chunks(parsed)), data_stream)
+        self.assertRaises(ValueError, builder.value, 'x'*256, 1)
+        self.assertRaises(ValueError, builder.value, 'Data', None)
+    def test_save(self):
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'test.zs2')
+            chunks = builder.section('Document', [builder.value('Value', 1.)])
+            self.assertEqual(builder.save(filename, chunks),
+                             encoder.fingerprint(parser.load(filename)))
+        finally:
+            shutil.rmtree(path)
+
+if __name__=='__main__':
+    unittest.main()
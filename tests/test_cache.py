@@ -0,0 +1,56 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import zs2decode.cache as cache
+import zs2decode.parser as parser
+import zs2decode.encoder as encoder
+
+import _fixtures
+
+def _data_stream(value):
+    chunks = [[None, 'Document', 'DD', ''],
+              [None, 'Value', 'CC', value],
+              [None, 'QS_TextPar', 'EE11-B4S', [1, u'Sample A', u'', u'', u'']],
+              [None, '', 'end', []]]
+    return encoder.make_datastream(encoder.make_raw_chunks(chunks))
+
+class Test(_fixtures.TestCase):
+    def _entries(self):
+        return sorted(name for name in os.listdir(self.path) if not name.startswith('.'))
+    def test_get_chunks(self):
+        data_stream = _data_stream(0.1)
+        expected = parser.parse_chunks(parser.data_stream_to_chunks(data_stream))
+        self.assertEqual(cache.get_chunks(data_stream, self.path), expected)
+        self.assertEqual(len(self._entries()), 1)
+        self.assertEqual(cache.get_chunks(data_stream, self.path), expected)
+        self.assertEqual(len(self._entries()), 1)
+        self.assertEqual(cache.get_chunks(data_stream, self.path, level=1)[1], [15, 'Value', 'CC', 0.1])
+        self.assertEqual(len(self._entries()), 2)
+    def test_evict(self):
+        cache.get_chunks(_data_stream(1.), self.path)
+        cache.get_chunks(_data_stream(2.), self.path)
+        older, newer = self._entries()
+        os.utime(os.path.join(self.path, older), (1000, 1000))
+        cache.evict(self.path, os.path.getsize(os.path.join(self.path, newer)))
+        self.assertEqual(self._entries(), [newer])
+        cache.clear(self.path)
+        self.assertEqual(self._entries(), [])
+    def test_load_mapped(self):
+        data_stream = _data_stream(0.1)
+        source = os.path.join(self.path, 'source')
+        os.mkdir(source)
+        filename = os.path.join(source, 'test.zs2')
+        encoder.save_zs2(filename, data_stream)
+        for cache_dir in (self.path, None):
+            for run in range(2):
+                mapped = cache.load_mapped(filename, cache_dir)
+                self.assertEqual(mapped[:], data_stream)
+                self.assertEqual(parser.data_stream_to_chunks(mapped),
+                                 parser.data_stream_to_chunks(data_stream))
+                mapped.close()
+        self.assertEqual(len(self._entries()), 2) # source and cache entry
+        self.assertTrue(os.path.exists(filename+'.raw'))
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import zs2decode.catalog as catalog
+
+import _fixtures
+from _fixtures import sample_chunks as _chunks
+
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.database = os.path.join(self.path, 'catalog.sqlite')
+        self.filenames = [self.save(name, _chunks()) for name in ('a.zs2', 'b.zs2')]
+    def test_index_files(self):
+        self.assertEqual(catalog.index_files(self.database, self.filenames, processes=1), {})
+        connection = catalog.connect(self.database)
+        try:
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM files').fetchone()[0], 2)
+            # identical content is stored once
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM contents').fetchone()[0], 1)
+            self.assertEqual(connection.execute('SELECT name FROM samples ORDER BY sample_idx').fetchall(),
+                             [(u'A',), (u'no-name-defined-1',)])
+            self.assertEqual(connection.execute('SELECT name, length, is_time FROM channels'
+                                                ' WHERE sample_idx = 0 ORDER BY id').fetchall(),
+                             [(u'Time', 5, 1), (u'Force', 5, 0), (u'Strain', 5, 0)])
+        finally:
+            connection.close()
+        found = [os.path.abspath(filename) for filename in self.filenames]
+        self.assertEqual(catalog.find_files(self.database, 48154, like=u'A%'), found)
+        self.assertEqual(catalog.find_files(self.database, 100, value=13.5), found)
+        self.assertEqual(catalog.find_files(self.database, 100, value=14.5), [])
+    def test_incremental(self):
+        catalog.index_files(self.database, self.filenames[:1], processes=1)
+        self.save('a.zs2', _chunks(rows=3))
+        os.utime(self.filenames[0], (0, 0))
+        catalog.index_files(self.database, self.filenames, processes=1)
+        connection = catalog.connect(self.database)
+        try:
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM contents').fetchone()[0], 2)
+            self.assertEqual(sorted(connection.execute('SELECT DISTINCT length FROM channels')),
+                             [(3,), (5,)])
+        finally:
+            connection.close()
+    def test_same_names(self):
+        self.save('a.zs2', _chunks(names=(u'B', u'A', u'B')))
+        catalog.index_files(self.database, self.filenames[:1], processes=1)
+        connection = catalog.connect(self.database)
+        try:
+            self.assertEqual(connection.execute('SELECT sample_idx, name FROM samples ORDER BY sample_idx').fetchall(),
+                             [(0, u'B'), (1, u'A'), (2, u'B')])
+            self.assertEqual(connection.execute('SELECT sample_idx, numeric FROM parameters'
+                                                ' WHERE id = 100 ORDER BY sample_idx').fetchall(),
+                             [(0, 12.5), (1, 13.5), (2, 14.5)])
+            self.assertEqual(connection.execute('SELECT sample_idx, COUNT(*) FROM channels'
+                                                ' GROUP BY sample_idx').fetchall(),
+                             [(0, 3), (1, 3), (2, 3)])
+        finally:
+            connection.close()
+    def test_removed(self):
+        catalog.index_files(self.database, self.filenames, processes=1)
+        os.remove(self.filenames[0])
+        catalog.index_files(self.database, self.filenames[1:], processes=1)
+        self.assertEqual(catalog.find_files(self.database, 48154), [os.path.abspath(self.filenames[1])])
+        self.save('c.zs2', _chunks(rows=3))
+        catalog.index_files(self.database, [os.path.join(self.path, 'c.zs2')], processes=1)
+        os.remove(self.filenames[1])
+        catalog.index_files(self.database, [], processes=1)
+        connection = catalog.connect(self.database)
+        try:
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM contents').fetchone()[0], 1)
+            self.assertEqual(connection.execute('SELECT DISTINCT length FROM channels').fetchall(), [(3,)])
+        finally:
+            connection.close()
+    def test_errors(self):
+        filename = os.path.join(self.path, 'broken.zs2')
+        with open(filename, 'wb') as f:
+            f.write(b'not a zs2 file')
+        errors = catalog.index_files(self.database, [filename], processes=1)
+        self.assertEqual(list(errors), [filename])
+
+if __name__ == '__main__':
+    unittest.main()
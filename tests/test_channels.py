@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import zs2decode.channels as channels
+
+import _fixtures
+from _fixtures import sample_chunks as _chunks
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import pandas
+except ImportError:
+    pandas = None
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.filename = self.save('test.zs2', _chunks())
+    def test_get_samples(self):
+        samples = channels.get_samples(_chunks())
+        self.assertEqual([sample['sample_name'] for sample in samples], [u'A', 'no-name-defined-1'])
+        self.assertEqual(samples[0]['time_channel_ID'], 3)
+        self.assertEqual([sample['sample_idx'] for sample in samples], [0, 1])
+        self.assertEqual(samples[0]['channel_data'][7]['name'], u'Force')
+        self.assertEqual([column[:2] for column in channels.get_columns(samples[0])],
+                         [(3, u'Time'), (7, u'Force'), (12, u'Strain')])
+        self.assertEqual(channels.get_columns(samples[0])[1][2], [7., 7.5, 8., 8.5, 9.])
+    def test_write_text(self):
+        sample = channels.get_samples(_chunks(rows=7))[0]
+        filename = os.path.join(self.path, 'sample.txt')
+        channels.write_text(sample, filename, block_size=3)
+        with open(filename, 'rt') as f:
+            lines = f.read().split('\n')
+        self.assertEqual(lines[:3], ['"Time"\t"Force"\t"Strain"', '3\t7\t12', '3\t7\t12'])
+        self.assertEqual(lines[-1], '6\t10\t15')
+        self.assertEqual(len(lines), 9)
+        with self.assertRaises(ValueError):
+            channels.export(self.filename, os.path.join(self.path, 'sample_%s.xlsx'))
+        sample['channel_data'][7]['data'] = None
+        with self.assertRaises(ValueError):
+            channels.write_text(sample, filename)
+        sample['channel_data'] = {}
+        with self.assertRaises(ValueError):
+            channels.write_text(sample, filename)
+    def test_get_parameters(self):
+        parameters = channels.get_parameters(_chunks())
+        self.assertEqual(parameters['ID'], [48154, 100, 48154, 100])
+        self.assertEqual(parameters['value'], [u'A', 12.5, u'', 13.5])
+        self.assertEqual(parameters['unit'], [None, u'mm', None, u'mm'])
+        self.assertEqual(parameters['sample_name'][-1], 'no-name-defined-1')
+        self.assertEqual(parameters['sample_idx'], [0, 0, 1, 1])
+    @unittest.skipIf(pandas is None, 'requires pandas')
+    def test_to_dataframe(self):
+        frame = channels.to_dataframe(channels.load_samples(self.filename)[0])
+        self.assertEqual(frame.index.name, u'Time')
+        self.assertEqual(list(frame.index), [3., 3.5, 4., 4.5, 5.])
+        self.assertEqual(list(frame.columns), [u'Force', u'Strain'])
+        self.assertEqual(list(frame[u'Strain']), [12., 12.5, 13., 13.5, 14.])
+        frame = channels.parameters_to_dataframe(_chunks())
+        self.assertEqual(list(frame[frame['ID'] == 100]['value']), [12.5, 13.5])
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_write_npz(self):
+        pattern = os.path.join(self.path, 'sample_%s.npz')
+        filenames = channels.export(self.filename, pattern)
+        self.assertEqual(filenames, [pattern % u'A', pattern % u'no-name-defined-1'])
+        with numpy.load(filenames[0]) as data:
+            self.assertEqual(list(data['Force']), [7., 7.5, 8., 8.5, 9.])
+    @unittest.skipIf(pyarrow is None, 'requires pyarrow')
+    def test_write_arrow_parquet(self):
+        import pyarrow.parquet
+        for extension in ('arrow', 'parquet'):
+            pattern = os.path.join(self.path, 'sample_%s.'+extension)
+            filename = channels.export(self.filename, pattern)[0]
+            if extension == 'arrow':
+                table = pyarrow.ipc.open_file(filename).read_all()
+            else:
+                table = pyarrow.parquet.read_table(filename)
+            self.assertEqual(table.column_names, [u'Time', u'Force', u'Strain'])
+            self.assertEqual(table.column('Time').to_pylist(), [3., 3.5, 4., 4.5, 5.])
+            self.assertEqual(table.schema.field('Strain').metadata, {b'id': b'12'})
+
+if __name__=='__main__':
+    unittest.main()
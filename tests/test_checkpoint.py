@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import random
+import sys
+import unittest
+import zs2decode.parser as parser
+import zs2decode.encoder as encoder
+
+import _fixtures
+
+@unittest.skipIf(sys.version_info < (3,3), 'requires Python 3.3')
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        import zs2decode.checkpoint as checkpoint
+        self.checkpoint = checkpoint
+        _fixtures.TestCase.setUp(self)
+        self.filename = os.path.join(self.path, 'test.zs2')
+        rng = random.Random(0)
+        chunks = [[None, 'Document', 'DD', '']]
+        for idx in range(8):
+            chunks += [[None, 'Elem%i' % idx, 'DD', ''],
+                       [None, 'DataArray', 'EE05', [round(rng.random(), 4) for i in range(30000)]],
+                       [None, '', 'end', []]]
+        chunks.append([None, '', 'end', []])
+        self.data_stream = encoder.make_datastream(encoder.make_raw_chunks(chunks))
+        encoder.save_zs2(self.filename, self.data_stream)
+    def test_read(self):
+        data_stream = self.checkpoint.load(self.filename, spacing=2**17)
+        self.assertEqual(data_stream, self.data_stream)
+        index = self.checkpoint.read_index(self.filename)
+        self.assertTrue(len(index) > 3)
+        for address in [4, 12345] + [checkpoint[0]+offset for checkpoint in index for offset in (-1, 0, 1)] + [len(data_stream)-10]:
+            self.assertEqual(self.checkpoint.read(self.filename, address, 100, index),
+                             data_stream[address:address+100])
+    def test_read_chunks(self):
+        self.checkpoint.load(self.filename, spacing=2**17)
+        raw_chunks = parser.data_stream_to_chunks(self.data_stream)
+        self.assertEqual(self.checkpoint.read_chunks(self.filename, raw_chunks[-4][0]), raw_chunks[-4:-1])
+        self.assertEqual(self.checkpoint.read_chunks(self.filename, raw_chunks[-3][0]), raw_chunks[-3:-2])
+        self.assertEqual(self.checkpoint.read_chunks(self.filename, raw_chunks[5][0], count=2), raw_chunks[5:7])
+    def test_stored_blocks(self):
+        # incompressible data is stored in stored deflate blocks
+        rng = random.Random(1)
+        chunks = [[None, 'Document', 'DD', ''],
+                  [None, 'DataArray', 'EE16', [rng.getrandbits(32) for i in range(2**18)]],
+                  [None, '', 'end', []]]
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(chunks))
+        encoder.save_zs2(self.filename, data_stream)
+        self.checkpoint.load(self.filename, spacing=2**17)
+        index = self.checkpoint.read_index(self.filename)
+        self.assertTrue(len(index) > 3)
+        for address in [checkpoint[0]+offset for checkpoint in index for offset in (-1, 0, 1)] + [len(data_stream)-10]:
+            self.assertEqual(self.checkpoint.read(self.filename, address, 100, index),
+                             data_stream[address:address+100])
+    def test_compressible(self):
+        # deflate blocks of data that compress well span hundreds of kB
+        chunks = [[None, 'Document', 'DD', ''],
+                  [None, 'DataArray', 'EE05', [float(i // 1000) for i in range(2**20)]],
+                  [None, 'Constant', 'EE05', [0.]*2**20],
+                  [None, '', 'end', []]]
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(chunks))
+        encoder.save_zs2(self.filename, data_stream)
+        self.checkpoint.load(self.filename, spacing=2**17)
+        index = self.checkpoint.read_index(self.filename)
+        self.assertTrue(len(index) > 3)
+        for address in [checkpoint[0]+offset for checkpoint in index for offset in (-1, 0, 1)]:
+            self.assertEqual(self.checkpoint.read(self.filename, address, 100, index),
+                             data_stream[address:address+100])
+    def test_without_libz(self):
+        # search for block boundaries with the zlib module only
+        load_libz = self.checkpoint._load_libz
+        self.checkpoint._load_libz = lambda ctypes: None
+        try:
+            self.test_read()
+            self.test_stored_blocks()
+        finally:
+            self.checkpoint._load_libz = load_libz
+    def test_stale_sidecar(self):
+        self.checkpoint.load(self.filename, spacing=2**17)
+        encoder.save_zs2(self.filename, self.data_stream[:-1])
+        self.assertEqual(self.checkpoint.read_index(self.filename), None)
+    def test_corrupt_sidecar(self):
+        self.checkpoint.load(self.filename, spacing=2**17)
+        with open(self.filename+'.idx', 'rb') as f:
+            sidecar = f.read()
+        for corrupt in (sidecar[:20], sidecar[:-100], sidecar[:60]+b'\x00'*50+sidecar[110:]):
+            with open(self.filename+'.idx', 'wb') as f:
+                f.write(corrupt)
+            self.assertEqual(self.checkpoint.read_index(self.filename), None)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import unittest
+import zs2decode.parser as parser
+import zs2decode.encoder as encoder
+import zs2decode.diff as diff
+
+def _data_stream(chunks):
+    return encoder.make_datastream(encoder.make_raw_chunks(chunks))
+
+def _chunks(sample_name, value, extra):
+    chunks = [[None, 'Document', 'DD', ''],
+              [None, 'Series', 'DD', ''],
+              [None, 'DataArray', 'EE05', [0.5*i for i in range(10000)]],
+              [None, '', 'end', []],
+              [None, 'Elem', 'DD', ''],
+              [None, 'QS_TextPar', 'EE11-B4S', [1, sample_name, u'', u'', u'']],
+              [None, '', 'end', []],
+              [None, 'Elem', 'DD', ''],
+              [None, 'Value', 'CC', value],
+              [None, '', 'end', []]]
+    return chunks + extra + [[None, '', 'end', []]]
+
+class Test(unittest.TestCase):
+    def test_diff_data_streams(self):
+        old = _data_stream(_chunks(u'Sample A', 1., [[None, 'Removed', 'DD', ''], [None, '', 'end', []]]))
+        new = _data_stream(_chunks(u'Sample B', 1., [[None, 'Added', '11', 3]]))
+        self.assertEqual(diff.diff_data_streams(old, old), [])
+        changes = diff.diff_data_streams(old, new)
+        self.assertEqual([change[:2] for change in changes],
+                         [['changed', 'Document/Elem/QS_TextPar'],
+                          ['removed', 'Document/Removed'],
+                          ['added', 'Document/Added']])
+        self.assertEqual(changes[0][2][3][1], u'Sample A')
+        self.assertEqual(changes[0][3][3][1], u'Sample B')
+        self.assertEqual(changes[2][3][2:], ['11', 3])
+        # second section of the same name
+        changes = diff.diff_data_streams(old, _data_stream(_chunks(u'Sample A', 2., [])))
+        self.assertEqual([change[0] for change in changes], ['changed', 'removed'])
+        self.assertEqual(changes[0][1:2]+changes[0][3][2:], ['Document/Elem/Value', 'CC', 2.])
+    def test_changed_sections(self):
+        old = _data_stream(_chunks(u'Sample A', 1., [[None, 'Removed', 'DD', ''], [None, '', 'end', []]]))
+        new = _data_stream(_chunks(u'Sample A', 2., []))
+        chunks, tree = parser.data_stream_to_chunks(old, with_hashes=True)
+        self.assertEqual(chunks, parser.data_stream_to_chunks(old))
+        self.assertEqual(tree, parser.section_tree(old))
+        self.assertEqual([section['address'] for section in parser.find_sections(tree, './Document/Elem')],
+                         [chunks[4][0], chunks[7][0]])
+        tree = json.loads(json.dumps(tree))
+        self.assertEqual(diff.changed_sections(tree, parser.section_tree(new)),
+                         [['changed', 'Document'], ['changed', 'Document/Elem'], ['removed', 'Document/Removed']])
+
+if __name__=='__main__':
+    unittest.main()
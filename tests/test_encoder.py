@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zs2decode.parser as parser
+import zs2decode.encoder as encoder
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def _join_packed(f, values):
+    out = bytearray()
+    for value in values:
+        out += encoder._pack1(f, value)
+    return out
+
+class Test(unittest.TestCase):
+    def test_pack_array(self):
+        values = {'f': [0., -1.5, 1e-3, float('inf'), 3],
+                  'd': [0., -1.5, 1e-300, float('-inf'), 1./3],
+                  'L': [0, 1, 2**32-1],
+                  'B': [0, 255]}
+        for f in values:
+            self.assertEqual(encoder._pack_array(f, values[f]), _join_packed(f, values[f]))
+            if numpy is not None:
+                self.assertEqual(encoder._pack_array(f, numpy.array(values[f])), _join_packed(f, values[f]))
+        self.assertEqual(encoder._pack_array('d', []), bytearray())
+        for f, value in [('L', 2**32), ('L', -1), ('B', 256), ('h', -2**15-1)]:
+            with self.assertRaises(struct.error):
+                encoder._pack_array(f, [0, value])
+            if numpy is not None:
+                with self.assertRaises(struct.error):
+                    encoder._pack_array(f, numpy.array([0, value]))
+    def test_encode_EE(self):
+        chunks = [[None, 'Document', 'DD', ''],
+                  [None, 'DataArray', 'EE04', [0.1*i for i in range(1000)]],
+                  [None, 'Channels', 'EE16', list(range(1000))],
+                  [None, 'QS_ValPar', 'EE11-BdSH(d)(B)B', [1, 1.5, u'a', 3, [0.5, 1.5], [1, 2], 0]],
+                  [None, 'QS_ArrPar', 'EE11-B(L)B', [2, [1, 2, -1], 0]],
+                  [None, '', 'end', []]]
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(chunks))
+        parsed = parser.parse_chunks(parser.data_stream_to_chunks(data_stream))
+        self.assertEqual(parsed[3][3], chunks[3][3])
+        self.assertEqual(parsed[4][3], chunks[4][3])
+        self.assertEqual(encoder.make_datastream(encoder.make_raw_chunks(parsed)), data_stream)
+    def test_write_zs2(self):
+        chunks = [[None, 'Document', 'DD', ''],
+                  [None, 'DataArray', 'EE05', [0.25*i for i in range(100000)]],
+                  [None, 'FileName', 'AA', u'test.zs2'],
+                  [None, '', 'end', []]]
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(chunks))
+        expected = encoder.save_zs2(None, data_stream)
+        with io.BytesIO() as f:
+            f.write(b'prefix')
+            self.assertEqual(encoder.write_zs2(f, iter(chunks)), encoder.fingerprint(data_stream))
+            self.assertEqual(f.getvalue(), b'prefix'+expected)
+    def test_patch_data_stream(self):
+        chunks = [[None, 'Document', 'DD', ''],
+                  [None, 'Body', 'DD', ''],
+                  [None, 'DataArray', 'EE05', [0.5, 1.5]],
+                  [None, 'QS_TextPar', 'EE11-B4S', [1, u'Sample A', u'', u'', u'']],
+                  [None, '', 'end', []],
+                  [None, 'Value', 'CC', 1.],
+                  [None, '', 'end', []]]
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(chunks))
+        raw_chunks = parser.data_stream_to_chunks(data_stream)
+        changes = {'./Document/Body/QS_TextPar': [1, u'Sample B2', u'', u'', u''],
+                   raw_chunks[5][0]: 2.}
+        chunks[3][3], chunks[5][3] = changes['./Document/Body/QS_TextPar'], 2.
+        self.assertEqual(encoder.patch_data_stream(data_stream, changes),
+                         encoder.make_datastream(encoder.make_raw_chunks(chunks)))
+        self.assertRaises(ValueError, encoder.patch_data_stream, data_stream, {'Document/Missing': 1})
+    def test_find_divergence(self):
+        chunks = [[None, 'Document', 'DD', ''],
+                  [None, 'Flag', '99', True],
+                  [None, 'DataArray', 'EE05', [0.5, 1.5]],
+                  [None, '', 'end', []]]
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(chunks))
+        self.assertEqual(encoder.find_divergence(data_stream), None)
+        # flag that is not encoded as 0 or 1
+        data_stream[21] = 2
+        self.assertEqual(encoder.find_divergence(data_stream), 15)
+    def test_verify_zs2_files(self):
+        path = tempfile.mkdtemp()
+        try:
+            filenames = [os.path.join(path, name) for name in ('a.zs2', 'b.zs2')]
+            chunks = [[None, 'Document', 'DD', ''], [None, '', 'end', []]]
+            encoder.save_zs2(filenames[0], encoder.make_datastream(encoder.make_raw_chunks(chunks)))
+            with open(filenames[1], 'wb') as f:
+                f.write(b'not a zs2 file')
+            results = encoder.verify_zs2_files(filenames, processes=2)
+            self.assertEqual(results[filenames[0]], None)
+            self.assertTrue(isinstance(results[filenames[1]], Exception))
+        finally:
+            shutil.rmtree(path)
+
+if __name__=='__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import zs2decode.parser as parser
+import zs2decode.encoder as encoder
+
+import _fixtures
+
+CHUNKS = [[None, 'Document', 'DD', ''],
+          [None, 'Header', 'DD', ''],
+          [None, 'FileName', 'AA', u'test.zs2'],
+          [None, 'ProgVersion', 'BB', 3.1],
+          [None, '', 'end', []],
+          [None, 'Body', 'DD', ''],
+          [None, 'DataArray', 'EE05', [0.5*i for i in range(50000)]],
+          [None, 'QS_TextPar', 'EE11-B4S', [1, u'Sample A', u'', u'', u'']],
+          [None, '', 'end', []],
+          [None, '', 'end', []]]
+
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.filename = os.path.join(self.path, 'test.zs2')
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(CHUNKS))
+        encoder.save_zs2(self.filename, data_stream)
+        self.raw_chunks = parser.data_stream_to_chunks(data_stream)
+    def test_iter_chunks(self):
+        for block_size in (16, 1000, 65536):
+            self.assertEqual(list(parser.iter_chunks(self.filename, block_size=block_size)),
+                             self.raw_chunks)
+    def test_get_paths(self):
+        self.assertEqual(parser.get_paths(self.raw_chunks)[3:8],
+                         ['Document/Header/ProgVersion', 'Document/Header',
+                          'Document/Body', 'Document/Body/DataArray',
+                          'Document/Body/QS_TextPar'])
+    def test_probe(self):
+        chunks = parser.probe(self.filename, paths=['./Document/Header'])
+        self.assertEqual([chunk[1] for chunk in chunks],
+                         ['Document', 'Header', 'FileName', 'ProgVersion', ''])
+        self.assertEqual(chunks[3][3], 3.1)
+        self.assertEqual(parser.probe(self.filename, max_chunks=2, level=0), self.raw_chunks[:2])
+        # the data array does not fit
+        self.assertEqual(parser.probe(self.filename, max_bytes=1000, level=0), self.raw_chunks[:6])
+    def test_load_many(self):
+        filenames = [self.filename]*5
+        data_stream = parser.load(self.filename)
+        self.assertEqual(list(parser.load_many(filenames, workers=2)), [(self.filename, data_stream)]*5)
+        self.assertEqual([data for _, data in parser.load_many(filenames, workers=2, ordered=False)],
+                         [data_stream]*5)
+        (_, chunks), = parser.load_many(filenames[:1], chunks=True)
+        self.assertEqual(list(chunks), self.raw_chunks)
+        (_, chunks), = parser.load_many(filenames[:1], chunks=True, debug=True)
+        self.assertEqual(list(chunks), parser.data_stream_to_chunks(data_stream, debug=True))
+        with self.assertRaises(Exception):
+            list(parser.load_many(filenames+[os.path.join(self.path, 'missing.zs2')], workers=2))
+
+if __name__=='__main__':
+    unittest.main()
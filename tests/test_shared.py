@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import zs2decode.builder as builder
+import zs2decode.parser as parser
+
+import _fixtures
+
+try:
+    import numpy
+    import zs2decode.shared as shared
+except ImportError:
+    numpy = None
+
+def _chunks(idx):
+    return builder.section('Document', [
+        builder.array('Small', [1., 2., 3.]),
+        builder.array('Single', numpy.arange(1001, dtype=numpy.float32)+idx),
+        builder.value('Version', idx),
+        builder.array('Double', numpy.arange(2000, dtype=numpy.float64)*idx),
+        builder.array('Counts', numpy.arange(3000, dtype=numpy.uint32)),
+        ])
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.filenames = [self.save('%i.zs2' % idx, _chunks(idx)) for idx in range(3)]
+    def test_load_chunks(self):
+        directory = os.path.join(self.path, 'shared')
+        os.mkdir(directory)
+        results = shared.load_chunks(self.filenames, processes=2, threshold=1000, directory=directory)
+        for idx, filename in enumerate(self.filenames):
+            expected = parser.parse_chunks(parser.data_stream_to_chunks(parser.load(filename)))
+            chunks = results[filename]
+            self.assertEqual([chunk[:3] for chunk in chunks], [chunk[:3] for chunk in expected])
+            self.assertEqual(chunks[1][3], [1., 2., 3.])
+            self.assertTrue(isinstance(chunks[2][3], numpy.ndarray))
+            self.assertEqual(chunks[2][3].dtype, numpy.float32)
+            self.assertFalse(chunks[2][3].flags.writeable)
+            self.assertEqual(chunks[2][3][-1], 1000+idx)
+            self.assertEqual(chunks[4][3].tolist(), expected[4][3])
+            self.assertEqual(chunks[5][3].tolist(), expected[5][3])
+        # no files are left behind
+        self.assertEqual(os.listdir(directory), [])
+    def test_errors(self):
+        with open(os.path.join(self.path, 'broken.zs2'), 'wb') as f:
+            f.write(b'not a zs2 file')
+        directory = os.path.join(self.path, 'shared')
+        os.mkdir(directory)
+        with self.assertRaises(Exception):
+            shared.load_chunks(self.filenames+[f.name], processes=2, threshold=1000, directory=directory)
+        self.assertEqual(os.listdir(directory), [])
+
+if __name__ == '__main__':
+    unittest.main()
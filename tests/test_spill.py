@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import zs2decode.parser as parser
+import zs2decode.encoder as encoder
+import zs2decode.util as util
+
+import _fixtures
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CHUNKS = [[None, 'Document', 'DD', ''],
+          [None, 'Small', 'EE05', [0.5, 1.5]],
+          [None, 'DataArray', 'EE05', [0.5*i for i in range(50000)]],
+          [None, 'Counts', 'EE16', list(range(30000))],
+          [None, 'QS_TextPar', 'EE11-B4S', [1, u'Sample A', u'', u'', u'']],
+          [None, '', 'end', []]]
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.filename = os.path.join(self.path, 'test.zs2')
+        data_stream = encoder.make_datastream(encoder.make_raw_chunks(CHUNKS))
+        encoder.save_zs2(self.filename, data_stream)
+        self.expected = parser.parse_chunks(parser.data_stream_to_chunks(data_stream))
+    def test_load_chunks(self):
+        import zs2decode.spill as spill
+        chunks = spill.load_chunks(self.filename, threshold=200000, directory=self.path)
+        self.assertEqual([chunk[:3] for chunk in chunks], [chunk[:3] for chunk in self.expected])
+        self.assertTrue(isinstance(chunks[2][3], numpy.memmap))
+        self.assertTrue(isinstance(chunks[3][3], list))
+        self.assertEqual(chunks[2][3].tolist(), self.expected[2][3])
+        self.assertEqual(chunks[4][3], self.expected[4][3])
+        self.assertEqual(util.chunks_to_XML(chunks), util.chunks_to_XML(self.expected))
+        chunks = spill.load_chunks(self.filename, threshold=1000)
+        self.assertEqual(chunks[3][3].dtype, numpy.dtype('<u4'))
+        self.assertEqual(util.chunks_to_text_dump(chunks), util.chunks_to_text_dump(self.expected))
+    def test_threshold(self):
+        import zs2decode.spill as spill
+        # arrays that fit into the read buffer
+        chunks = list(spill.iter_chunks(self.filename, threshold=1000, block_size=2**20))
+        self.assertTrue(isinstance(chunks[1][3], list))
+        self.assertTrue(isinstance(chunks[2][3], numpy.memmap))
+        self.assertTrue(isinstance(chunks[3][3], numpy.memmap))
+        self.assertEqual(chunks[3][3].tolist(), self.expected[3][3])
+        # level 1 does not decode arrays
+        raw_chunks = parser.data_stream_to_chunks(parser.load(self.filename))
+        self.assertEqual(spill.load_chunks(self.filename, level=1, threshold=1000),
+                         parser.parse_chunks(raw_chunks, level=1))
+
+if __name__=='__main__':
+    unittest.main()
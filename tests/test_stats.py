@@ -0,0 +1,62 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import unittest
+import zs2decode.builder as builder
+import zs2decode.cache as cache
+import zs2decode.encoder as encoder
+import zs2decode.parser as parser
+import zs2decode.stats as stats
+import zs2decode.util as util
+
+import _fixtures
+
+CHUNKS = builder.section('Document', [
+    builder.value('Version', 3),
+    builder.array('DataArray', [0.5*i for i in range(100)]),
+    builder.record('QS_TextPar', 'B4S', [1, u'Sample A', u'', u'', u'']),
+    builder.record('QS_ValPar', 'B4S', [1, u'Sample A', u'', u'', u'']), # not a known format
+    ])
+
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.filename = self.save('test.zs2', CHUNKS)
+    def test_collect(self):
+        load = parser.load
+        calls = []
+        with stats.collect(lambda *args: calls.append(args)) as statistics:
+            xml_data = encoder.zs2_to_xml(self.filename, None)
+            cache.load_chunks(self.filename, self.path)
+            chunks = cache.load_chunks(self.filename, self.path)
+            text_dump = util.chunks_to_text_dump(chunks)
+            with io.BytesIO() as f:
+                util.write_text_dump(iter(chunks), f)
+        self.assertTrue(parser.load is load)
+        stages = statistics['stages']
+        self.assertEqual(stages['load']['calls'], 3)
+        self.assertEqual(stages['load']['bytes'], 3*len(parser.load(self.filename)))
+        self.assertEqual(stages['parse_chunks']['chunks'], 2*6)
+        self.assertEqual(stages['parse_chunks/3']['calls'], 2)
+        self.assertEqual(stages['ee11_grammar']['calls'], 2*2)
+        self.assertEqual(stages['chunks_to_XML']['bytes'], len(xml_data))
+        self.assertEqual(stages['write_text_dump']['bytes'], 2*len(text_dump))
+        self.assertEqual(stages['write_text_dump']['chunks'], 2*6)
+        self.assertEqual(statistics['chunk_types'], {'DD': 2, '11': 2, 'EE05': 2, 'EE11': 4, 'end': 2})
+        self.assertEqual(statistics['heuristics'], {'QS_ValPar': 2})
+        self.assertEqual(statistics['cache'], {'hits': 1, 'misses': 1})
+        self.assertEqual(len(calls), sum(stage['calls'] for stage in stages.values()))
+        self.assertEqual(calls[0][0], 'load')
+    def test_enable(self):
+        statistics = stats.enable()
+        try:
+            with self.assertRaises(RuntimeError):
+                stats.enable()
+            parser.load(self.filename)
+        finally:
+            stats.disable()
+        parser.load(self.filename)
+        self.assertEqual(statistics['stages']['load']['calls'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import json
+import math
+import os
+import shutil
+import tempfile
+import unittest
+import zs2decode.parser as parser
+import zs2decode.builder as builder
+import zs2decode.encoder as encoder
+import zs2decode.util as util
+
+try:
+    import numpy
+    import zs2decode.spill as spill
+except ImportError:
+    numpy = None
+
+def _chunks():
+    chunks = builder.section('Document', [
+                builder.value('FileName', u'test.zs2'),
+                builder.array('DataArray', [0.5*i for i in range(100)])])
+    return parser.parse_chunks(parser.data_stream_to_chunks(builder.to_data_stream(chunks)))
+
+class Test(unittest.TestCase):
+    def test_write_text_dump(self):
+        chunks = _chunks()
+        with io.BytesIO() as f:
+            util.write_text_dump(iter(chunks), f)
+            self.assertEqual(f.getvalue(), util.chunks_to_text_dump(chunks))
+        with io.BytesIO() as f:
+            util.write_text_dump(chunks, f, max_items=2)
+            lines = f.getvalue().decode('UTF-8').split('\n')
+        self.assertEqual(lines[2], u'00002d:   DataArray [EE05] [0.0, 0.5, ...] (100 items, min 0.0, max 49.5) ')
+    def test_format_value(self):
+        for value in [0.1, -1e300, float('nan'), float('-inf'), 3, True, u'a"é',
+                      [], [0.5, 2, float('inf'), float('nan'), -0.], [1, u'b', [2.5]]]:
+            self.assertEqual(util._format_value(value), json.dumps(value, ensure_ascii=False))
+        self.assertTrue(math.isnan(encoder._parse_value('CC', 'NaN')))
+        self.assertEqual(encoder._parse_value('BB', '-Infinity'), float('-inf'))
+        self.assertEqual(encoder._parse_value('22', '7'), 7)
+        self.assertEqual(encoder._parse_value('EE05', '[0.5, Infinity]'), [0.5, float('inf')])
+    def test_ndjson(self):
+        chunks = _chunks()
+        records = [json.loads(line) for line in util.iter_ndjson(iter(chunks), max_items=40)]
+        self.assertEqual([record['path'] for record in records],
+                         ['Document', 'Document/FileName'] + ['Document/DataArray']*3 + ['Document'])
+        self.assertEqual(records[1], {'path': 'Document/FileName', 'address': chunks[1][0],
+                                      'type': 'AA', 'value': 'test.zs2'})
+        self.assertEqual([record.get('offset') for record in records[2:5]], [0, 40, 80])
+        self.assertEqual(sum([record['value'] for record in records[2:5]], []), chunks[2][3])
+        with io.BytesIO() as f:
+            util.write_ndjson(chunks, f)
+            lines = f.getvalue().decode('UTF-8').split('\n')
+        self.assertEqual(len(lines), len(chunks)+1)
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_ndjson_spill(self):
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'test.zs2')
+            builder.save(filename, builder.section('Document', [
+                builder.value('FileName', u'test.zs2'),
+                builder.array('DataArray', [0.5*i for i in range(100)])]))
+            lines = list(util.iter_ndjson(spill.iter_chunks(filename, threshold=16, directory=path), max_items=40))
+        finally:
+            shutil.rmtree(path)
+        self.assertEqual(lines, list(util.iter_ndjson(_chunks(), max_items=40)))
+
+if __name__=='__main__':
+    unittest.main()
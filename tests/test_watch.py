@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import unittest
+import zs2decode.catalog as catalog
+import zs2decode.watch as watch
+
+import _fixtures
+from _fixtures import sample_chunks as _chunks
+
+def _touch(filename):
+    with open(filename + '.done', 'a') as f:
+        f.write('x')
+
+class Test(_fixtures.TestCase):
+    def setUp(self):
+        _fixtures.TestCase.setUp(self)
+        self.journal = os.path.join(self.path, 'journal.txt')
+        self.filename = self.save('a.zs2', _chunks())
+    def _run(self, **kwargs):
+        return watch.run(self.path, _touch, journal=self.journal, interval=0,
+                         processes=1, **kwargs)
+    def test_stable(self):
+        # file is processed only after it was unchanged for two polls
+        self.assertEqual(self._run(max_polls=1), {})
+        self.assertEqual(self._run(max_polls=2), {os.path.abspath(self.filename): None})
+        self.assertEqual(os.path.getsize(self.filename + '.done'), 1)
+    def test_journal(self):
+        self._run(max_polls=2)
+        # restart skips processed files
+        self.assertEqual(self._run(max_polls=2), {})
+        os.utime(self.filename, (0, 0))
+        self.assertEqual(len(self._run(max_polls=2)), 1)
+        self.assertEqual(os.path.getsize(self.filename + '.done'), 2)
+        self.assertEqual(watch.read_journal(self.journal),
+                         {os.path.abspath(self.filename): (os.path.getsize(self.filename), 0)})
+        # the journal is compacted at the start
+        with open(self.journal, 'r') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self._run(max_polls=1)
+        with open(self.journal, 'r') as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(len(watch.read_journal(self.journal)), 1)
+    def test_errors(self):
+        with open(os.path.join(self.path, 'broken.zs2'), 'wb') as f:
+            f.write(b'not a zs2 file')
+        database = os.path.join(self.path, 'catalog.sqlite')
+        out = watch.run(self.path, database=database, journal=self.journal, interval=0,
+                        processes=2, max_polls=2)
+        self.assertEqual(sorted(os.path.basename(path) for path in out), ['a.zs2', 'broken.zs2'])
+        self.assertTrue(isinstance(out[os.path.join(self.path, 'broken.zs2')], Exception))
+        self.assertEqual(catalog.find_files(database, 48154, u'A'), [os.path.abspath(self.filename)])
+        # failed files are not tried again until they change
+        self.assertEqual(watch.run(self.path, database=database, journal=self.journal,
+                                   interval=0, processes=1, max_polls=2), {})
+
+if __name__ == '__main__':
+    unittest.main()